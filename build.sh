@@ -5,21 +5,9 @@ version=1.5
 file=${project}-${version}.jar
 nohint_file=${project/OreHints/VeinBuffs}-${version}.jar
 
-rm -f ${file}
-rm -f ${nohint_file}
-
-#delete and build here not working?!?
-rm -rf src{,_veinbuffs}/data/*
+# generates world gen and the book straight into both jars, see resources/package.py
+# jars are reproducible, and only rebuilt when their inputs change
 source ../TerraFirmaCraft/venv3.11/bin/activate
-python resources worldgen
-python resources book
-
-cd src
-rm -r assets
-jar --create --file ../${file} *
-cd ../src_veinbuffs
-rm -r assets
-jar --create --file ../${nohint_file} *
+python resources package --jar-version ${version} --release
 
-cd ..
-ls -l *.jar
+ls -l ${file} ${nohint_file}
@@ -7,18 +7,7 @@ Where actions can be any list of actions to take.
 """
 
 from argparse import ArgumentParser
-from mcresources import ResourceManager, utils
-from typing import Optional
-
-import os
-import sys
-import json
-import difflib
-
-import constants
-import world_gen
-import generate_book
-import format_lang
+from typing import Optional, List, Tuple
 
 BOOK_LANGUAGES = ('en_us', 'ko_kr', 'pt_br', 'uk_ua', 'zh_cn', 'zh_tw')
 MOD_LANGUAGES = ('en_us', 'es_es', 'ja_jp', 'ko_kr', 'pt_br', 'ru_ru', 'tr_tr', 'uk_ua', 'zh_cn', 'zh_tw')
@@ -33,27 +22,108 @@ def main():
         'book',  # generate the book
         'format_lang',  # format language files
         'update_lang',  # useful to update localizations after a change to the base which renders some translations incorrect
+        'simulate',  # monte carlo simulation of vein spawning, requires numpy
+        'analyze',  # report the y bands where veins compete for the same rock
+        'hints',  # estimate the surface density and reliability of vein hints, requires numpy
+        'preview',  # rasterize veins into voxels, and report the distribution of each ore block placed by a single vein, requires numpy
+        'availability',  # expected ore per chunk by y level and rock, in closed form, requires numpy
+        'tune',  # search the numbers of a preset for target yields of each ore in each y band, requires numpy
+        'package',  # generate world gen and book straight into the mod jars
+        'watch',  # regenerate world gen and book whenever their sources change
+        'benchmark',  # check the import time of every action, and the time of every generator over scaled up inputs
     ))
     parser.add_argument('--translate', type=str, default='en_us', help='Runs the book translation using a single provided language')
     parser.add_argument('--translate-all', action='store_true', dest='translate_all', help='Runs the book against all provided translations')
     parser.add_argument('--local', type=str, default=None, help='Points to a local minecraft instance. Used for \'book\', to generate a hot reloadable book, and used for \'clean\', to clean said instance\'s book')
     parser.add_argument('--hotswap', action='store_true', dest='hotswap', help='Causes resource generation to also generate to --hotswap-dir')
     parser.add_argument('--hotswap-dir', type=str, default='./out/production/resources', help='Used for \'--hotswap\'')
+    parser.add_argument('--force', action='store_true', dest='force', help='Ignores the manifest of previously generated files, and checks every file against the generated content. For \'package\', rebuilds jars with unchanged inputs')
+    parser.add_argument('--jobs', type=int, default=None, help='Number of worker processes used to write resource trees, or book languages, concurrently, or to evaluate \'tune\' candidates. Defaults to one per tree or language, or per cpu for \'tune\', 1 runs serially')
+    parser.add_argument('--jar-version', type=str, default='dev', dest='jar_version', help='Used for \'package\', the version in the jar file names')
+    parser.add_argument('--release', action='store_true', dest='release', help='Used for \'package\', writes the world gen and book as minified json, without the comment, and with sorted keys')
+    parser.add_argument('--veins', type=str, default=None, help='A vein definition file (.toml, .json or .csv) used by \'worldgen\', \'simulate\' and \'package\', in addition to, or instead of, the veins in constants.py. See vein_data.py')
+    parser.add_argument('--variants', type=str, default=None, help='A variant definition file (.toml or .json), declaring the mods to build, each with its own domain, resource directory, jar, hints, surprise veins and preset overrides. See variants.py')
+    parser.add_argument('--variant', type=str, action='append', default=None, help='Only builds the named variant. Can be given more than once')
+    parser.add_argument('--chunks', type=int, default=10000, help='Used for \'simulate\' and \'hints\', the side length of the simulated square of chunks')
+    parser.add_argument('--band-height', type=int, default=16, dest='band_height', help='Used for \'simulate\', the height of each y band that ore is counted in')
+    parser.add_argument('--samples', type=int, default=None, help='Used for \'simulate\', the maximum number of spawned veins that are rasterized per vein (default 16384), and for \'preview\', the number of sampled veins (default 1024, about 0.6 s for the builtin veins, and linear in the samples)')
+    parser.add_argument('--seed', type=int, default=0, help='Used for \'simulate\', \'hints\' and \'preview\', the random seed')
+    parser.add_argument('--region', type=int, default=32, help='Used for \'hints\', the side length, in chunks, of the regions hints are counted in, rounded up to a multiple of 8')
+    parser.add_argument('--loose-rocks', type=float, default=4, dest='loose_rocks', help='Used for \'hints\', the naturally generated loose rocks per chunk, which look the same as loose rock hints')
+    parser.add_argument('--minable-depth', type=int, default=24, dest='minable_depth', help='Used for \'hints\', how far below the surface a vein can be for its hint to count as reliable')
+    parser.add_argument('--output', type=str, default=None, help='Used for \'simulate\', \'analyze\', \'hints\', \'preview\' and \'tune\', a csv file to write the full results to. For \'availability\', a directory to write csv and npy tables to')
+    parser.add_argument('--vein', type=str, action='append', default=None, help='Used for \'preview\', only rasterizes the named vein. Can be given more than once')
+    parser.add_argument('--images', type=str, default=None, help='Used for \'preview\', a directory to write a png of a horizontal and vertical slice through one sample of each vein to')
+    parser.add_argument('--targets', type=str, default=None, help='Used for \'tune\', a target file (.toml or .json) with the preset to tune, and the yield of each ore in each y band. See tune.py')
+    parser.add_argument('--min-veins', type=int, default=2, dest='min_veins', help='Used for \'analyze\', the number of veins competing for a rock that a band is reported at')
+    parser.add_argument('--history', type=str, default=None, help='Used for \'benchmark\', runs the scaling benchmark, appending the results to this json file and comparing against it. Without one, only import times are measured')
+    parser.add_argument('--profile', type=str, nargs='?', const='./profile.json', default=None, help='Records the time and peak memory of each phase of every action, and the bytes written to each output directory, to a json report. Runs everything in this process')
+    parser.add_argument('--profile-stats', type=str, default=None, dest='profile_stats', help='Used for \'--profile\', also dumps cProfile stats of the whole run to this file')
 
     args = parser.parse_args()
     hotswap = args.hotswap_dir if args.hotswap else None
-
-    for action in args.actions:
-        if action == 'clean':
-            clean(args.local)
-        elif action == 'validate':
-            validate_resources()
-        elif action == 'all':
-            resources(hotswap=hotswap, do_worldgen=True)
-        elif action == 'worldgen':
-            resources(hotswap=hotswap, do_worldgen=True)
-        elif action == 'book':
-            generate_book.main()
+    jobs = args.jobs
+    if args.veins is not None:
+        import vein_table
+        vein_table.VEINS_FILE = args.veins
+    if args.variants is not None or args.variant is not None:
+        import variants
+        variants.VARIANTS_FILE = args.variants
+        variants.SELECTED = args.variant
+
+    if args.profile is None:
+        for action in args.actions:
+            run(action, args, hotswap, jobs)
+        return
+
+    import profiling
+    profiling.start(args.profile_stats)
+    try:
+        for action in args.actions:
+            with profiling.phase(action):
+                run(action, args, hotswap, 1)  # Phases are only recorded in this process
+    finally:
+        profiling.stop(args.profile)
+
+def run(action: str, args, hotswap: Optional[str], jobs: Optional[int]):
+    if action == 'clean':
+        clean(args.local)
+    elif action == 'validate':
+        validate_resources()
+    elif action == 'all':
+        resources(hotswap=hotswap, do_worldgen=True, jobs=jobs, force=args.force)
+    elif action == 'worldgen':
+        resources(hotswap=hotswap, do_worldgen=True, jobs=jobs, force=args.force)
+    elif action == 'book':
+        import generate_book
+        generate_book.main(BOOK_LANGUAGES if args.translate_all else (args.translate,), jobs=jobs, local=args.local)
+    elif action == 'package':
+        import package
+        package.main(args.jar_version, release=args.release, force=args.force)
+    elif action == 'watch':
+        import watch
+        watch.main(hotswap, args.local)
+    elif action == 'simulate':
+        import simulate  # numpy is only required for this action
+        simulate.main(args.chunks, args.band_height, args.samples or 1 << 14, args.seed, args.output)
+    elif action == 'analyze':
+        import analyze
+        analyze.main(args.output, args.min_veins)
+    elif action == 'hints':
+        import hints  # numpy is only required for this action
+        hints.main(args.chunks, args.region, args.loose_rocks, args.minable_depth, args.seed, args.output)
+    elif action == 'preview':
+        import preview  # numpy is only required for this action
+        preview.main(args.vein, args.samples or preview.SAMPLES, args.seed, args.output, args.images)
+    elif action == 'availability':
+        import availability  # numpy is only required for this action
+        availability.main(args.output)
+    elif action == 'tune':
+        import tune  # numpy is only required for this action
+        tune.main(args.targets, jobs, args.output)
+    elif action == 'benchmark':
+        import benchmark
+        benchmark.main(args.history)
 
 def clean(local: Optional[str]):
     """ Cleans all generated resources files """
@@ -63,6 +133,7 @@ def clean(local: Optional[str]):
         clean_at(local)
 
 def clean_at(location: str):
+    from mcresources import utils
     for tries in range(1, 1 + 3):
         try:
             utils.clean_generated_resources(location)
@@ -75,17 +146,19 @@ def clean_at(location: str):
 
 def validate_resources():
     """ Validates all resources are unchanged. """
+    from validation import ValidatingResourceManager
+    import generate_book
+    import format_lang
+
     rm = ValidatingResourceManager('tfc', './src')
     resources_at(rm, True, True, True, True, True)
     error = rm.error_files != 0
 
-    for lang in BOOK_LANGUAGES:
-        try:
-            generate_book.main(lang, None, True, rm)
-            error |= rm.error_files != 0
-        except AssertionError as e:
-            print(e)
-            error = True
+    try:
+        error |= generate_book.main(BOOK_LANGUAGES, validate=True) != 0
+    except AssertionError as e:
+        print(e)
+        error = True
 
     for lang in MOD_LANGUAGES:
         try:
@@ -97,51 +170,66 @@ def validate_resources():
     assert not error, 'Validation Errors Were Present'
 
 
-def resources(hotswap: str = None, do_assets: bool = False, do_data: bool = False, do_recipes: bool = False, do_worldgen: bool = False, do_advancements: bool = False):
+def resources(hotswap: str = None, do_assets: bool = False, do_data: bool = False, do_recipes: bool = False, do_worldgen: bool = False, do_advancements: bool = False, jobs: Optional[int] = None, force: bool = False):
     """ Generates resource files, or a subset of them """
-    resources_at(ResourceManager('tfc', resource_dir='./src'), do_assets, do_data, do_recipes, do_worldgen, do_advancements)
+    from concurrent.futures import ProcessPoolExecutor
+    from profiling import phase
+    import variants
+
+    # Every variant writes its own tree, and the hotswap directory mirrors the first variant
+    selected = variants.variants()
+    targets: List[Tuple[str, 'variants.Variant']] = [(v.resource_dir, v) for v in selected]
     if hotswap:
-        resources_at(ResourceManager('tfc', resource_dir=hotswap), do_assets, do_data, do_recipes, do_worldgen, do_advancements)
-    resources_at(ResourceManager('tfc', resource_dir='./src_veinbuffs'), do_assets, do_data, do_recipes, do_worldgen, do_advancements, do_hints = False)
+        targets.insert(1, (hotswap, selected[0]))
 
+    # The vein model is shared by every variant with the same veins, only the emission differs
+    with phase('model'):
+        models = variants.build_models(selected) if do_worldgen else {}
+    flags = (do_assets, do_data, do_recipes, do_worldgen, do_advancements)
 
-def resources_at(rm: ResourceManager, do_assets: bool, do_data: bool, do_recipes: bool, do_worldgen: bool, do_advancements: bool, do_hints = True):
-    # do simple lang keys first, because it's ordered intentionally
-    rm.lang(constants.DEFAULT_LANG)
+    if jobs == 1:
+        for resource_dir, variant in targets:
+            print(resources_in(resource_dir, *flags, do_hints=variant.hints, model=models.get(variant.name), force=force))
+        return
 
-    # generic assets / data
-    if do_worldgen:
-        world_gen.generate(rm, do_hints)
-    rm.flush()
+    with ProcessPoolExecutor(max_workers=jobs or len(targets)) as pool:
+        futures = [pool.submit(resources_in, resource_dir, *flags, do_hints=variant.hints, model=models.get(variant.name), force=force) for resource_dir, variant in targets]
+        for future in futures:
+            print(future.result())
 
-    print('New = %d, Modified = %d, Unchanged = %d, Errors = %d' % (rm.new_files, rm.modified_files, rm.unchanged_files, rm.error_files))
 
+def resources_in(resource_dir: str, do_assets: bool, do_data: bool, do_recipes: bool, do_worldgen: bool, do_advancements: bool, do_hints: bool = True, model: Optional['world_gen.VeinModel'] = None, force: bool = False) -> str:
+    """ Generates resources into a single tree. Runs in a worker process, so the resource manager is created here """
+    from manifest import IncrementalResourceManager
+    from profiling import phase, written
 
-class ValidatingResourceManager(ResourceManager):
+    with phase(resource_dir):
+        rm = IncrementalResourceManager('tfc', resource_dir, force)
+        resources_at(rm, do_assets, do_data, do_recipes, do_worldgen, do_advancements, do_hints, model, quiet=True)
+        with phase('finish'):
+            rm.finish()
+    written(resource_dir, rm.written_files)
+    return '%s: New = %d, Modified = %d, Unchanged = %d, Deleted = %d, Errors = %d' % (resource_dir, rm.new_files, rm.modified_files, rm.unchanged_files, rm.deleted_files, rm.error_files)
 
-    def __init__(self, domain: str, resource_dir):
-        super(ValidatingResourceManager, self).__init__(domain, resource_dir)
-        self.validation_error = False
 
-    def write(self, path_parts, data_to_write):
-        data_to_write = utils.del_none({'__comment__': 'This file was automatically created by mcresources', **data_to_write})
-        path = os.path.join(*path_parts) + '.json'
-        try:
-            if not os.path.isfile(path):
-                print('Error: resource generation created new file \'%s\'' % path, file=sys.stderr)
-                self.error_files += 1
-                return
-            with open(path, 'r', encoding='utf-8') as file:
-                old_data = json.load(file)
-            if old_data != data_to_write:
-                old_text = json.dumps(old_data, indent=self.indent)
-                text = json.dumps(data_to_write, indent=self.indent)
-                diff = '\n'.join(difflib.unified_diff(old_text.split('\n'), text.split('\n'), 'old', 'new', n=1))
-                print('Error: resource generation modified file \'%s\' Diff:\n%s\n' % (path, diff), file=sys.stderr)
-                self.error_files += 1
-        except Exception as e:
-            self.on_error(path, e)
-            self.error_files += 1
+def resources_at(rm: 'ResourceManager', do_assets: bool, do_data: bool, do_recipes: bool, do_worldgen: bool, do_advancements: bool, do_hints = True, model: Optional['world_gen.VeinModel'] = None, quiet: bool = False):
+    from profiling import phase
+    import constants
+    import world_gen
+
+    # do simple lang keys first, because it's ordered intentionally
+    with phase('lang'):
+        rm.lang(constants.DEFAULT_LANG)
+
+    # generic assets / data
+    if do_worldgen:
+        with phase('worldgen'):
+            world_gen.generate(rm, do_hints, model)
+    with phase('flush'):
+        rm.flush()
+
+    if not quiet:
+        print('New = %d, Modified = %d, Unchanged = %d, Errors = %d' % (rm.new_files, rm.modified_files, rm.unchanged_files, rm.error_files))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,99 @@
+# Finds the y bands where veins compete for the same rock, to spot overlaps and ore deserts before they reach players
+# Each rock has an interval index of the [min_y, max_y] of every vein that replaces it, which is swept once, in O(n log n + bands) over all veins and rocks, instead of comparing every pair of veins.
+
+import bisect
+import csv
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from vein_table import CompiledVein, VeinTable
+import vein_table
+
+
+class Band(NamedTuple):
+    rock: str
+    min_y: int
+    max_y: int  # Inclusive, as with vein heights
+    veins: Tuple[CompiledVein, ...]  # Every vein that can spawn in this rock over the whole band, by name
+
+    @property
+    def height(self) -> int:
+        return self.max_y - self.min_y + 1
+
+    @property
+    def crowding(self) -> float:
+        """ The expected number of veins of this band spawning per chunk, which is the sum of 1 / rarity """
+        return sum(1 / v.vein.rarity for v in self.veins)
+
+
+class RockIndex:
+    """
+    An interval index of the veins replacing a single rock. The y axis is split at every vein's min_y and max_y + 1 into bands, each with the veins covering it.
+    Built with a single sweep over the sorted endpoints, and queried with a binary search.
+    """
+
+    def __init__(self, rock: str, veins: Sequence[CompiledVein]):
+        self.rock = rock
+        events = sorted([(v.vein.min_y, 1, v) for v in veins] + [(v.vein.max_y + 1, -1, v) for v in veins], key=lambda e: (e[0], e[1]))
+        self.starts: List[int] = []
+        self.bands: List[Band] = []
+        active: Dict[str, CompiledVein] = {}
+        for i, (y, delta, v) in enumerate(events):
+            if delta > 0:
+                active[v.name] = v
+            else:
+                del active[v.name]
+            if i + 1 < len(events) and events[i + 1][0] == y:
+                continue  # Apply every event at the same y before emitting a band
+            if active and i + 1 < len(events):
+                self.starts.append(y)
+                self.bands.append(Band(rock, y, events[i + 1][0] - 1, tuple(active[name] for name in sorted(active))))
+            # Bands with no veins are left out, y values between bands are ore deserts for this rock
+
+    def at(self, y: int) -> Tuple[CompiledVein, ...]:
+        """ The veins which can spawn in this rock at y """
+        i = bisect.bisect_right(self.starts, y) - 1
+        if i >= 0 and y <= self.bands[i].max_y:
+            return self.bands[i].veins
+        return ()
+
+    def overlaps(self, min_veins: int = 2) -> List[Band]:
+        return [b for b in self.bands if len(b.veins) >= min_veins]
+
+
+def build_index(table: VeinTable) -> Dict[str, RockIndex]:
+    """ An interval index for every rock, from the expanded rocks of each vein """
+    by_rock: Dict[str, List[CompiledVein]] = {rock: [] for rock in table.rocks}
+    for v in table.veins:
+        for rock in dict.fromkeys(v.rocks):  # A rock may be listed both by name and by category
+            by_rock[rock].append(v)
+    return {rock: RockIndex(rock, veins) for rock, veins in by_rock.items()}
+
+
+def overlaps(table: VeinTable, min_veins: int = 2) -> List[Band]:
+    """ Every band where at least min_veins veins compete for the same rock, most crowded first """
+    bands = [b for index in build_index(table).values() for b in index.overlaps(min_veins)]
+    return sorted(bands, key=lambda b: (-b.crowding, b.rock, b.min_y))
+
+
+def main(output: Optional[str], min_veins: int = 2, limit: int = 50):
+    table = vein_table.table()
+    bands = overlaps(table, min_veins)
+
+    print('%d bands where %d or more veins compete for the same rock, over %d veins and %d rocks' % (len(bands), min_veins, len(table.veins), len(table.rocks)))
+    print('%-18s %-12s %8s %9s   %s' % ('Rock', 'Y', 'Veins', 'Per Chunk', 'Competing Veins'))
+    for b in bands[:limit]:
+        print('%-18s %-12s %8d %9.3f   %s' % (b.rock, '%d..%d' % (b.min_y, b.max_y), len(b.veins), b.crowding, ', '.join(v.name for v in b.veins)))
+    if len(bands) > limit:
+        print('... and %d more bands%s' % (len(bands) - limit, '' if output is None else ', see %s' % output))
+
+    if output is not None:
+        write_csv(bands, output)
+        print('Wrote every band to %s' % output)
+
+
+def write_csv(bands: Sequence[Band], path: str):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['rock', 'min_y', 'max_y', 'veins', 'per_chunk', 'competing'])
+        for b in bands:
+            writer.writerow([b.rock, b.min_y, b.max_y, len(b.veins), '%.4f' % b.crowding, ' '.join(v.name for v in b.veins)])
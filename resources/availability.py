@@ -0,0 +1,188 @@
+# Expected ore availability by y level and rock, in closed form, to see the effect of a preset change on the ore economy without a simulation
+# Requires numpy. For every vein, the expected ore blocks per chunk at each y level is a convolution of the distribution of its center with the expected horizontal area of its shape:
+# - Every chunk rolls each vein once, spawning with chance 1 / rarity, centered at a uniform y in [min_y, max_y]
+# - The shapes are simulate.py's: the expected area of a cluster is over the radius and offset of each sphere, and the number of spheres, scaled by clusters.cluster_union() so overlaps are counted once
+# - A level is the block from y to y + 1. Clusters are evaluated at the middle of each level, discs and pipes are integrated over it
+# - Each block is ore with chance = density, and only if the level is one of the vein's rocks. The blocks of each rock are split by their weights, as in the vein configs
+#
+# Tables are (veins, levels, rocks) of ore blocks per chunk, assuming the level is that rock. Products are the block types placed, without the rock, i.e. 'tfc:ore/poor_hematite'.
+# The profile of each vein shape is cached by its type and size, so tables for an edited preset are recomputed in milliseconds, once the union of each cluster size is measured.
+
+import csv
+import json
+import os
+import time
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from clusters import MAX_CLUSTERS, cluster_union
+from constants import ORES
+from simulate import PIPE_RADIUS
+from vein_table import VeinTable
+import vein_table
+
+MIN_Y = -64
+MAX_Y = 210
+GRADE_UNITS = {'poor': 15, 'normal': 25, 'rich': 35}  # mB of metal per ore block in TFC
+
+
+class Availability(NamedTuple):
+    veins: Tuple[str, ...]
+    levels: np.ndarray  # (levels,) the y of each level
+    rocks: Tuple[str, ...]
+    products: Tuple[str, ...]  # Block types, without the rock
+    units: np.ndarray  # (products,) mB of metal per block of each graded metal ore, and 1 for every other block
+    blocks: np.ndarray  # (veins, levels, rocks) expected ore blocks per chunk, of any product
+    split: np.ndarray  # (veins, rocks, products) the share of each product in the ore of a vein, in each rock
+
+    def product_blocks(self) -> np.ndarray:
+        """ (products, levels, rocks) expected blocks per chunk of each product, over all veins """
+        return np.einsum('vyr,vrp->pyr', self.blocks, self.split)
+
+    def product_units(self) -> np.ndarray:
+        """ (products, levels, rocks) expected units per chunk of each product: mB of metal for graded ores, blocks otherwise """
+        return self.product_blocks() * self.units[:, None, None]
+
+
+def availability(table: VeinTable, min_y: int = MIN_Y, max_y: int = MAX_Y) -> Availability:
+    """ Expected ore per chunk of every vein in the table, at each level from min_y to max_y inclusive, and in each rock """
+    levels = np.arange(min_y, max_y + 1)
+    rocks = tuple(table.rocks.keys())
+    rock_index = {r: i for i, r in enumerate(rocks)}
+    products: Dict[str, int] = {}
+
+    blocks = np.zeros((len(table.veins), len(levels), len(rocks)))
+    splits: List[Tuple[int, int, int, float]] = []  # (vein, rock, product, share)
+    for i, v in enumerate(table.veins):
+        vein = v.vein
+        blocks[i] = (vein_profile(vein.type, vein.size, vein.height, vein.min_y, vein.max_y, min_y, max_y) * (vein.density * 0.01 / vein.rarity))[:, None]
+        in_rock = np.zeros(len(rocks), dtype=bool)
+        for rock, entry in zip(v.rocks, v.blocks):
+            if in_rock[rock_index[rock]]:
+                continue  # A rock may be listed both by name and by category
+            in_rock[rock_index[rock]] = True
+            total = sum(option.get('weight', 1) for option in entry['with'])
+            for option in entry['with']:
+                product = products.setdefault(option['block'].rsplit('/', 1)[0], len(products))
+                splits.append((i, rock_index[rock], product, option.get('weight', 1) / total))
+        blocks[i] *= in_rock
+
+    split = np.zeros((len(table.veins), len(rocks), len(products)))
+    for i, r, p, share in splits:
+        split[i, r, p] += share
+    units = np.array([product_units(p) for p in products], dtype=np.float64)
+    return Availability(tuple(v.name for v in table.veins), levels, rocks, tuple(products), units, blocks, split)
+
+
+def product_units(product: str) -> int:
+    """ mB of metal per block, for a graded metal ore such as 'tfc:ore/poor_hematite', or 1 """
+    grade, _ = product_ore(product)
+    return 1 if grade is None else GRADE_UNITS[grade]
+
+
+def product_ore(product: str) -> Tuple[Optional[str], Optional[str]]:
+    """ The (grade, ore) of a product, i.e. ('poor', 'hematite') for 'tfc:ore/poor_hematite', (None, 'sulfur') for 'tfc:ore/sulfur', and (None, None) for anything but an ore """
+    if not product.startswith('tfc:ore/'):
+        return None, None
+    name = product[len('tfc:ore/'):]
+    grade, _, ore = name.partition('_')
+    if grade in GRADE_UNITS and ore in ORES and ORES[ore].metal is not None:
+        return grade, ore
+    return None, name
+
+
+@lru_cache(maxsize=None)
+def vein_profile(vein_type: str, size: int, height: int, vein_min_y: int, vein_max_y: int, min_y: int, max_y: int) -> np.ndarray:
+    """ (levels,) expected blocks of a spawned vein's shape at each level from min_y to max_y, with its center uniform in [vein_min_y, vein_max_y] """
+    extent, kernel = shape_profile(vein_type, size, height)
+    profile = np.convolve(np.full(vein_max_y - vein_min_y + 1, 1 / (vein_max_y - vein_min_y + 1)), kernel)  # From vein_min_y - extent
+    result = np.zeros(max_y - min_y + 1)
+    start = vein_min_y - extent - min_y
+    lo, hi = max(start, 0), min(start + len(profile), len(result))
+    if lo < hi:
+        result[lo:hi] = profile[lo - start:hi - start]
+    return result
+
+
+@lru_cache(maxsize=None)
+def shape_profile(vein_type: str, size: int, height: int) -> Tuple[int, np.ndarray]:
+    """ The expected blocks of a vein's shape at each level relative to its center, from -extent to +extent, and extent """
+    if vein_type == 'cluster':
+        extent = size + int(np.ceil(np.sqrt(1.1) * size)) + 1
+        middle = np.arange(-extent, extent + 1) + 0.5
+        offsets = np.arange(1 - size, size)
+        offset_chance = (size - np.abs(offsets)) / (size * size)  # The difference of two uniform integers in [0, size)
+        extra_spheres = 1 + sum((MAX_CLUSTERS - k) / (MAX_CLUSTERS - 1) for k in range(2, MAX_CLUSTERS))  # 2 - 5 spheres, the first at the center
+        spheres = mean_sphere_area(middle, 0.6, 1.1, size) + extra_spheres * offset_chance @ mean_sphere_area(middle[None, :] - offsets[:, None], 0.3, 0.8, size)
+        return extent, spheres * cluster_union(size)
+    elif vein_type == 'disc':
+        return cylinder_profile(height, np.pi * size * size)
+    elif vein_type == 'pipe':
+        return cylinder_profile(size, np.pi * PIPE_RADIUS * PIPE_RADIUS)
+    raise ValueError('Unknown vein type: %s' % vein_type)
+
+
+def mean_sphere_area(t: np.ndarray, lo: float, hi: float, size: int) -> np.ndarray:
+    """ The expected area of a sphere's cross section at distance t from its center, with radius^2 uniform in [lo, hi] * size^2 """
+    lo, hi, t2 = lo * size * size, hi * size * size, t * t
+    inside = (lo + hi) / 2 - t2  # Every radius reaches t
+    partial = (hi - np.minimum(t2, hi)) ** 2 / (2 * (hi - lo))  # Only radii above t reach it
+    return np.pi * np.where(t2 <= lo, inside, partial)
+
+
+def cylinder_profile(height: float, area: float) -> Tuple[int, np.ndarray]:
+    """ The blocks of a vertical cylinder at each level relative to its center, as in simulate.cylinder_band_volumes() """
+    extent = int(np.ceil(height / 2)) + 1
+    bottom = np.arange(-extent, extent + 1)
+    return extent, area * np.clip(np.minimum(bottom + 1, height / 2) - np.maximum(bottom, -height / 2), 0, None)
+
+
+def main(output: Optional[str]):
+    table = vein_table.table()
+    start = time.perf_counter()
+    result = availability(table)
+    elapsed = time.perf_counter() - start
+
+    blocks = result.product_blocks()
+    units = result.product_units()
+    print('Expected ore per chunk from y = %d to %d, averaged over %d rocks, computed in %.1f ms' % (MIN_Y, MAX_Y, len(result.rocks), 1000 * elapsed))
+    print('%-32s %8s %12s %12s %10s   %s' % ('Product', 'Units', 'Blocks', 'Total Units', 'Peak Y', 'Rocks'))
+    for p, product in enumerate(result.products):
+        by_level = blocks[p].mean(axis=1)
+        rocks = [r for i, r in enumerate(result.rocks) if blocks[p, :, i].any()]
+        print('%-32s %8d %12.2f %12.1f %10d   %s' % (
+            product, result.units[p], by_level.sum(), units[p].mean(axis=1).sum(), result.levels[by_level.argmax()], ', '.join(rocks) if len(rocks) < len(result.rocks) else 'all'
+        ))
+    print('Blocks and units are summed over every level, as if every rock were equally common. Units are mB of metal for graded metal ores, and blocks otherwise')
+
+    if output is not None:
+        write_tables(result, output)
+        print('Wrote availability tables to %s' % output)
+
+
+def write_tables(result: Availability, directory: str):
+    """ Writes the tables as .npy arrays, with their axes in axes.json, and the products as a csv of every non zero (product, level, rock) """
+    os.makedirs(directory, exist_ok=True)
+    blocks = result.product_blocks()
+    units = blocks * result.units[:, None, None]
+    np.save(os.path.join(directory, 'vein_blocks.npy'), result.blocks)
+    np.save(os.path.join(directory, 'product_blocks.npy'), blocks)
+    np.save(os.path.join(directory, 'product_units.npy'), units)
+    with open(os.path.join(directory, 'axes.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'vein_blocks.npy': ['veins', 'levels', 'rocks'],
+            'product_blocks.npy': ['products', 'levels', 'rocks'],
+            'product_units.npy': ['products', 'levels', 'rocks'],
+            'veins': result.veins,
+            'levels': result.levels.tolist(),
+            'rocks': result.rocks,
+            'products': result.products,
+            'units': result.units.tolist(),
+        }, f, indent=2)
+    with open(os.path.join(directory, 'products.csv'), 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['product', 'y', 'rock', 'blocks', 'units'])
+        for p, y, r in zip(*np.nonzero(blocks)):
+            writer.writerow([result.products[p], result.levels[y], result.rocks[r], '%.6f' % blocks[p, y, r], '%.6f' % units[p, y, r]])
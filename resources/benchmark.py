@@ -0,0 +1,328 @@
+# Benchmarks for the resource scripts, which are run many times per CI run, and from editor hooks
+# - Startup: the import time of every action, with the modules each imports read from __main__.py, against a fixed budget
+# - Scaling: the generators over synthetic inputs of increasing size
+# If a history file is given, both are also compared against the last run recorded in it which had no regressions.
+
+import ast
+import contextlib
+import io
+import json
+import os
+import pickle
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+# Budget, in ms, for importing everything an action needs, in a fresh interpreter. About three times the time on a developer machine, so only a new heavy import at module level goes over
+IMPORT_BUDGETS: Dict[str, float] = {
+    'clean': 90,
+    'validate': 150,
+    'all': 200,
+    'worldgen': 200,
+    'book': 120,
+    'package': 200,
+    'watch': 150,
+    'simulate': 450,
+    'analyze': 150,
+    'hints': 450,
+    'preview': 450,
+    'availability': 450,
+    'tune': 450,
+    'benchmark': 150,
+}
+
+IMPORT_SCRIPT = '''
+import sys, time
+sys.path.insert(0, %r)
+start = time.perf_counter()
+import argparse
+%s
+print(1000 * (time.perf_counter() - start))
+'''
+
+SCALES = (1, 2, 4, 8)  # Multiples of the base sizes below. Each step doubles the input
+BASE_ROCKS = 20  # Spread evenly over the rock categories
+BASE_VEINS = 4  # Per vein type (cluster, disc, pipe), in every vein family
+BASE_ENTRIES = 25  # Book entries, ten per category, each with two text pages
+BASE_LANG_KEYS = 250
+
+REPEATS = 3  # Each measurement is the fastest of this many runs, which is the least sensitive to a busy machine
+REGRESSION_TOLERANCE = 0.3  # Relative slowdown against the baseline that is flagged
+REGRESSION_FLOOR = 0.005  # Seconds. Slowdowns smaller than this are noise
+STARTUP_TOLERANCE = 0.5  # Relative slowdown of an import time against the baseline that is flagged, as a fresh interpreter is noisier than a warm one
+STARTUP_FLOOR = 15  # ms. Slower imports by less than this are noise
+CLIFF_RATIO = 1.5  # Growth of the time per output byte, from one scale to the next, above this is reported as superlinear
+CLIFF_FLOOR = 0.02  # Seconds. Faster measurements are too noisy to judge the growth
+
+
+class Scale(NamedTuple):
+    rocks: int
+    veins: int  # Per vein type, in every vein family
+    entries: int
+    lang_keys: int
+
+
+def main(history: Optional[str] = None, runs: int = 5):
+    """ Runs the startup benchmark, and if a history file is given, the scaling benchmark. Fails if any action is over its import budget, or any import or generator has regressed against the history """
+    imports, errors = startup(action_imports(), runs)
+    if history is not None:
+        errors += scaling(history, imports)
+    assert not errors, 'Benchmarks failed for %d measurement(s):\n%s' % (len(errors), '\n'.join(errors))
+
+
+def action_imports() -> Dict[str, Tuple[str, ...]]:
+    """ The import statements of each action, read from its branch of run() in __main__.py, and from the functions of __main__.py it uses """
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '__main__.py'), 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    functions = {node.name: node for node in tree.body if isinstance(node, ast.FunctionDef)}
+
+    def imports(nodes: Sequence[ast.AST], seen: Set[str]) -> List[str]:
+        statements = []
+        for child in (c for node in nodes for c in ast.walk(node)):
+            if isinstance(child, (ast.Import, ast.ImportFrom)):
+                statements.append(ast.unparse(child))
+            elif isinstance(child, ast.Name) and child.id in functions and child.id not in seen:
+                seen.add(child.id)
+                statements += imports(functions[child.id].body, seen)
+        return statements
+
+    result = {}
+    branch = next(node for node in functions['run'].body if isinstance(node, ast.If))  # if action == '...': ... elif action == '...': ...
+    while branch is not None:
+        result[branch.test.comparators[0].value] = tuple(dict.fromkeys(imports(branch.body, set())))
+        branch = branch.orelse[0] if branch.orelse else None
+    return result
+
+
+def startup(action_imports: Dict[str, Tuple[str, ...]], runs: int) -> Tuple[Dict[str, float], List[str]]:
+    """ Measures the import time, in ms, of every action, returning the times and the actions which are over, or have no, budget """
+    times = {}
+    violations = []
+    print('%-12s %10s %10s   %s' % ('Action', 'Import ms', 'Budget ms', 'Imports'))
+    for action, statements in action_imports.items():
+        elapsed = times[action] = import_time(statements, runs)
+        budget = IMPORT_BUDGETS.get(action)
+        print('%-12s %10.1f %10s   %s' % (action, elapsed, '-' if budget is None else '%.0f' % budget, '; '.join(statements)))
+        if budget is None:
+            violations.append('%s: no import budget, see IMPORT_BUDGETS' % action)
+        elif elapsed > budget:
+            violations.append('import of %s: %.1f ms > %.0f ms budget' % (action, elapsed, budget))
+    return times, violations
+
+
+def import_time(statements: Sequence[str], runs: int) -> float:
+    """ The median time, in ms, to import argparse and run the given import statements, each run in a fresh interpreter so nothing is cached in sys.modules """
+    script = IMPORT_SCRIPT % (os.path.dirname(os.path.abspath(__file__)), '\n'.join(statements))
+    times = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+        times.append(float(result.stdout.strip()))
+    return statistics.median(times)
+
+
+def scaling(history: str, imports: Dict[str, float], scales: Sequence[int] = SCALES) -> List[str]:
+    """
+    Times every generator at every scale, and appends the results, with the import times, to the history file.
+    Returns the measurements which are slower than in the last run that had no regressions.
+    """
+    sizes: Dict[str, Scale] = {}
+    results: Dict[str, Dict[str, float]] = {}
+    output: Dict[str, Dict[str, int]] = {}
+    for s in scales:
+        scale = Scale(BASE_ROCKS * s, BASE_VEINS * s, BASE_ENTRIES * s, BASE_LANG_KEYS * s)
+        sizes[str(s)] = scale
+        for name, (seconds, size) in measure(scale).items():
+            results.setdefault(name, {})[str(s)] = seconds
+            output.setdefault(name, {})[str(s)] = size
+
+    runs = load_history(history)
+    baseline = next((run for run in reversed(runs) if not run['regressions']), None)
+
+    regressions = []
+    for action, elapsed in imports.items():
+        before = baseline.get('startup', {}).get(action) if baseline is not None else None
+        if before is not None and elapsed > before * (1 + STARTUP_TOLERANCE) and elapsed - before > STARTUP_FLOOR:
+            regressions.append('import of %s: %.1f ms, was %.1f ms' % (action, elapsed, before))
+            print('Import of %s regressed: %.1f ms, was %.1f ms' % (action, elapsed, before))
+
+    print('Scales: %s' % ', '.join('x%s = %d rocks, %d veins, %d entries, %d keys' % (s, scale.rocks, scale.veins * 15, scale.entries, scale.lang_keys) for s, scale in sizes.items()))
+    print('%-20s%s' % ('Benchmark', ''.join('%12s' % ('x%s ms' % s) for s in sizes)))
+    for name, by_scale in results.items():
+        row = ''
+        for s, seconds in by_scale.items():
+            before = baseline['results'].get(name, {}).get(s) if baseline is not None else None
+            flag = ' '
+            if before is not None and seconds > before * (1 + REGRESSION_TOLERANCE) and seconds - before > REGRESSION_FLOOR:
+                regressions.append('%s at x%s: %.1f ms, was %.1f ms' % (name, s, 1000 * seconds, 1000 * before))
+                flag = '!'
+            row += '%11.1f%s' % (1000 * seconds, flag)
+        print('%-20s%s%s' % (name, row, cliffs(by_scale, output[name])))
+
+    runs.append({
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': '%d.%d.%d' % sys.version_info[:3],
+        'sizes': {s: scale._asdict() for s, scale in sizes.items()},
+        'startup': imports,
+        'results': results,
+        'output_bytes': output,
+        'regressions': regressions,
+    })
+    with open(history, 'w', encoding='utf-8') as f:
+        json.dump(runs, f, indent=2)
+    print('Wrote results to %s%s' % (history, '' if baseline is None else ', compared against the run at %s' % baseline['time']))
+    return regressions
+
+
+def cliffs(by_scale: Dict[str, float], output: Dict[str, int]) -> str:
+    """ Reports where the time per byte of output grows by more than CLIFF_RATIO from one scale to the next. World gen output grows with rocks x veins, so the time alone is expected to grow faster than the input """
+    steep = []
+    scales = list(by_scale)
+    for a, b in zip(scales, scales[1:]):
+        growth = (by_scale[b] / max(output[b], 1)) / (by_scale[a] / max(output[a], 1)) if by_scale[a] > 0 else 0
+        if growth > CLIFF_RATIO and by_scale[b] > CLIFF_FLOOR:
+            steep.append('x%s -> x%s: %.1fx per byte' % (a, b, growth))
+    return '   superlinear at %s' % ', '.join(steep) if steep else ''
+
+
+def load_history(path: str) -> List[Dict[str, Any]]:
+    if not os.path.isfile(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def measure(scale: Scale) -> Dict[str, Tuple[float, int]]:
+    """ Times each generator over the synthetic inputs of a given scale, in a temporary directory. Returns the time and the size of the output of each """
+    from mcresources import ResourceManager
+
+    from fragments import FRAGMENTS
+    from i18n import I18n
+    from validation import ValidatingResourceManager
+    from vein_table import VeinTable
+    from writer import BufferedResourceManager
+    import analyze
+    import format_lang
+    import world_gen
+
+    rocks = synthetic_rocks(scale.rocks)
+    families = synthetic_veins(rocks, scale.veins)
+    results = {}
+    with tempfile.TemporaryDirectory() as root, contextlib.redirect_stdout(io.StringIO()):
+        def generate():
+            rm = ResourceManager('tfc', root)
+            world_gen.generate(rm, True, world_gen.build_model(VeinTable(rocks, families)))
+            rm.flush()
+
+        def generate_in_worker():
+            # As resources() does with more than one job, the model is pickled to the worker, where its fragments are new objects, which must still be encoded once each
+            model = world_gen.build_model(VeinTable(rocks, families))
+            FRAGMENTS.encoded.clear()
+            rm = BufferedResourceManager('tfc', root)
+            world_gen.generate(rm, True, model)
+            rm.flush()
+            expected = len(FRAGMENTS.encoded)
+            rm = BufferedResourceManager('tfc', root)
+            world_gen.generate(rm, True, pickle.loads(pickle.dumps(model)))
+            rm.flush()
+            assert len(FRAGMENTS.encoded) == 2 * expected, 'Fragments of a pickled model were not shared: %d encoded, expected %d' % (len(FRAGMENTS.encoded) - expected, expected)
+
+        def validate():
+            rm = ValidatingResourceManager('tfc', root)
+            world_gen.generate(rm, True, world_gen.build_model(VeinTable(rocks, families)))
+            rm.flush()
+            assert rm.error_files == 0, 'Validation of unchanged files failed'
+
+        def build_book():
+            rm = ResourceManager('tfcgyres_orehints', root)
+            synthetic_book(rm, I18n('en_us'), scale.entries).build()
+            rm.flush()
+
+        results['world_gen.generate'] = timed(generate), directory_size(os.path.join(root, 'data'))
+        results['world_gen.worker'] = timed(generate_in_worker), directory_size(os.path.join(root, 'data'))
+        results['validation'] = timed(validate), directory_size(os.path.join(root, 'data'))  # Against the files written by generate()
+        results['Book.build'] = timed(build_book), directory_size(os.path.join(root, 'data', 'tfcgyres_orehints'))
+
+        table = VeinTable(rocks, families)
+        analysis = os.path.join(root, 'analysis.csv')
+        results['analyze.overlaps'] = timed(lambda: analyze.write_csv(analyze.overlaps(table), analysis)), os.path.getsize(analysis)
+
+        cwd = os.getcwd()
+        try:
+            os.chdir(root)  # format_lang works on fixed paths relative to the working directory
+            en_us = synthetic_lang(scale.lang_keys)
+            results['format_lang'] = timed(lambda: format_lang.format_lang(en_us, 'xx_xx', False)), os.path.getsize('./src/main/resources/assets/tfc/lang/xx_xx.json')
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def timed(action: Callable[[], Any]) -> float:
+    """ The fastest wall time, in seconds, of a number of runs """
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        action()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+# Synthetic Inputs
+
+def synthetic_rocks(n: int) -> Dict[str, 'Rock']:
+    from constants import ROCK_CATEGORIES, Rock
+    return {'rock_%d' % i: Rock(ROCK_CATEGORIES[i % len(ROCK_CATEGORIES)], 'sand_%d' % i) for i in range(n)}
+
+
+def synthetic_veins(rocks: Dict[str, 'Rock'], per_type: int) -> Tuple[Tuple[str, Dict[str, 'Vein']], ...]:
+    """ Veins in every family, of every type, over rock categories and single rocks, some with spoilers """
+    from constants import MINERAL_INDICATORS, ROCK_CATEGORIES, preset_vein, vein
+    from vein_table import VEIN_FAMILIES
+
+    minerals = tuple(MINERAL_INDICATORS.keys())  # Mineral veins need an ore with a hint rock
+    rock_names = tuple(rocks.keys())
+    families = []
+    for family, _ in VEIN_FAMILIES:
+        preset = 'DEEP_MINERAL_ORE' if 'mineral' in family else 'REALLY_DEEP_METAL_ORE' if 'deep' in family else 'HIGH_METAL_ORE'
+        veins = {}
+        for i in range(per_type):
+            ore = minerals[i % len(minerals)] if 'mineral' in family else 'ore_%d' % i
+            category = ROCK_CATEGORIES[i % len(ROCK_CATEGORIES)]
+            rock = rock_names[i % len(rock_names)]
+            veins['%s_cluster_%d' % (family, i)] = preset_vein(ore, 'cluster', [category], 'gypsum', 20, [rock], preset=preset)
+            veins['%s_disc_%d' % (family, i)] = preset_vein(ore, 'disc', [category, rock], preset=preset, height=3, deposits=family == 'high_ore')
+            veins['%s_pipe_%d' % (family, i)] = vein(ore, 'pipe', 60, 60, -64, 100, 40, 0, 0, 0, [category])
+        families.append((family, veins))
+    return tuple(families)
+
+
+def synthetic_book(rm: 'ResourceManager', i18n: 'I18n', entries: int) -> 'Book':
+    """ A book with ten entries per category, where every entry links to the one before it """
+    from patchouli import Book, entry, text
+
+    book = Book(rm, 'field_guide', {}, i18n, False, reverse_translate=False)
+    for c in range(0, entries, 10):
+        book.category('category_%d' % c, 'Category %d' % c, 'A synthetic category.', 'tfc:ore/graphite', is_sorted=True, entries=tuple(
+            entry('entry_%d' % e, 'Entry %d' % e, 'tfc:ore/graphite', pages=(
+                text('Text for entry %d. See $(l:category_%d/entry_%d)the previous entry$().' % (e, c, max(e - 1, c))),
+                text(('More text for entry %d, which is a bit longer, as most pages are.$(br2)' % e) * 4, title='Entry %d' % e),
+            )) for e in range(c, min(c + 10, entries))
+        ))
+    return book
+
+
+def synthetic_lang(keys: int) -> Dict[str, str]:
+    """ Writes an english and a half translated language file to the working directory, returning the english one """
+    en_us = {'key.%d' % i: 'Value %d' % i for i in range(keys)}
+    xx_xx = {k: 'Translated %d' % i for i, k in enumerate(en_us) if i % 2 == 0}
+    os.makedirs('./src/main/resources/assets/tfc/lang', exist_ok=True)
+    for lang, data in (('en_us', en_us), ('xx_xx', xx_xx)):
+        with open('./src/main/resources/assets/tfc/lang/%s.json' % lang, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    return en_us
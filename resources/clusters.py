@@ -0,0 +1,99 @@
+# The union of the spheres of cluster veins, rasterized into voxels
+# Shared by preview.py, which counts the blocks of sampled clusters, and by simulate.py and availability.py, which scale the volume of the spheres by cluster_union() so overlaps are counted once. Requires numpy.
+#
+# Voxels are counted exactly, without testing every block: each sphere covers an interval of y in each (x, z) column of a disk, which is or-ed into a bitset of the column.
+
+import functools
+from typing import Tuple
+
+import numpy as np
+
+MAX_CLUSTERS = 5
+CLUSTER_COLUMNS = 1 << 18  # Columns of the sampled cluster veins in each array op, so the voxel bitsets of a batch stay in cache
+UNION_SAMPLES = 1 << 10  # Sampled cluster veins measured for cluster_union()
+UNION_MAX_SIZE = 24  # Larger clusters have the share of cluster_union() at this size, which no longer depends on the size
+LOW_BITS = np.array([(1 << k) - 1 for k in range(65)], dtype=np.uint64)  # The lowest k bits set, for k in [0, 64]
+
+
+def cluster_extent(size: int) -> int:
+    """ The furthest a block of a cluster vein can be from its center, on any axis """
+    return size + int(np.ceil(np.sqrt(1.1) * size))
+
+
+def cluster_batch(size: int) -> int:
+    """ Sampled cluster veins in each array op """
+    return max(1, CLUSTER_COLUMNS // (2 * cluster_extent(size) + 1) ** 2)
+
+
+def draw_clusters(size: int, rng: np.random.Generator, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """ (n, clusters, 3) sphere centers and (n, clusters) squared radii, as in simulate.vein_band_volumes(). Unused spheres have a negative radius """
+    clusters = rng.integers(2, MAX_CLUSTERS, size=n, endpoint=True)
+    r2 = (np.where(np.arange(MAX_CLUSTERS) == 0, 0.6, 0.3) + 0.5 * rng.random((n, MAX_CLUSTERS))) * size * size
+    r2[np.arange(MAX_CLUSTERS)[None, :] >= clusters[:, None]] = -1
+    centers = rng.integers(0, size, size=(n, MAX_CLUSTERS, 3)) - rng.integers(0, size, size=(n, MAX_CLUSTERS, 3))
+    centers[:, 0] = 0
+    return centers, r2
+
+
+def cluster_union(size: int) -> float:
+    """ The expected blocks within the union of a cluster vein's spheres, over the expected sum of their volumes. Overlapping spheres make this about 0.65 """
+    return measure_union(min(size, UNION_MAX_SIZE))
+
+
+@functools.lru_cache
+def measure_union(size: int) -> float:
+    """ cluster_union(), measured with a fixed seed, so the share of a size is the same on every run """
+    rng = np.random.default_rng(size)
+    union = spheres = 0
+    batch = cluster_batch(size)
+    for start in range(0, UNION_SAMPLES, batch):
+        centers, r2 = draw_clusters(size, rng, min(batch, UNION_SAMPLES - start))
+        union += cluster_volumes(centers, r2, size).sum()
+        spheres += 4 / 3 * np.pi * (np.maximum(r2, 0) ** 1.5).sum()
+    return float(union / spheres)
+
+
+@functools.lru_cache
+def disk_offsets(size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """ Every (x, z) column within the largest sphere of a cluster vein, nearest first, as (columns,) indices into a square of +/- cluster_extent(), and squared distances """
+    radius = int(np.ceil(np.sqrt(1.1) * size))
+    side = 2 * cluster_extent(size) + 1
+    axis = np.arange(-radius, radius + 1)
+    d2 = (axis[:, None] ** 2 + axis[None, :] ** 2).ravel()
+    order = np.argsort(d2, kind='stable')
+    return (axis[:, None] * side + axis[None, :]).ravel()[order], d2[order]
+
+
+def cluster_volumes(centers: np.ndarray, r2: np.ndarray, size: int) -> np.ndarray:
+    """ (n,) blocks within the union of each sample's spheres """
+    grid = cluster_bitsets(centers, r2, size)
+    return np.bitwise_count(grid).reshape(grid.shape[0], len(r2), -1).sum(axis=(0, 2), dtype=np.int64)
+
+
+def cluster_bitsets(centers: np.ndarray, r2: np.ndarray, size: int) -> np.ndarray:
+    """
+    (words, n * x * z) the union of each sample's spheres, over +/- cluster_extent() on each axis.
+    Each column of a sample is a bitset of y, as words of 64 blocks. Each sphere covers an interval of y in the columns of a disk, which are the nearest of disk_offsets(), and is or-ed into its columns.
+    """
+    n, clusters = r2.shape
+    extent = cluster_extent(size)
+    side = 2 * extent + 1
+    words = -(-side // 64)
+    offsets, d2 = disk_offsets(size)
+
+    grid = np.zeros((words, n * side * side), dtype=np.uint64)
+    base = (np.arange(n)[:, None] * side + centers[:, :, 0] + extent) * side + centers[:, :, 2] + extent  # (n, clusters) column of each center
+    count = np.searchsorted(d2, r2, side='right')  # (n, clusters) columns within each sphere
+    for k in range(clusters):
+        columns = count[:, k]
+        j = np.arange(columns.sum()) - np.repeat(np.cumsum(columns) - columns, columns)  # Index of each covered column in the offsets
+        half = np.sqrt(np.repeat(r2[:, k], columns) - d2[j]).astype(np.int64)
+        y = np.repeat(centers[:, k, 1] + extent, columns)
+        column = np.repeat(base[:, k], columns) + offsets[j]
+        for w in range(words):
+            bits = LOW_BITS[np.clip(y + half + 1 - 64 * w, 0, 64)] & ~LOW_BITS[np.clip(y - half - 64 * w, 0, 64)]
+            if k == 0:
+                grid[w, column] = bits  # Each sphere covers a column once, and the first is the only one in the grid
+            else:
+                grid[w, column] |= bits
+    return grid
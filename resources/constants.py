@@ -35,6 +35,7 @@ class Vein(NamedTuple):
     biomes: Optional[str]
     height: Optional[int]
     deposits: bool
+    preset: Optional[str] = None  # The name, in PRESETS, of the preset the numbers are from
 
 
 ROCK_CATEGORIES = ('sedimentary', 'metamorphic', 'igneous_extrusive', 'igneous_intrusive')
@@ -121,15 +122,16 @@ MINERAL_INDICATORS: Dict[str, str] = {
     'diamond': 'chalk'
 }
 
-def vein(ore: str, vein_type: str, rarity: int, size: int, min_y: int, max_y: int, density: int, poor: float, normal: float, rich: float, rocks: List[str], spoiler_ore: Optional[str] = None, spoiler_rarity: int = 0, spoiler_rocks: List[str] = None, biomes: str = None, height: int = 2, deposits: bool = False):
+def vein(ore: str, vein_type: str, rarity: int, size: int, min_y: int, max_y: int, density: int, poor: float, normal: float, rich: float, rocks: List[str], spoiler_ore: Optional[str] = None, spoiler_rarity: int = 0, spoiler_rocks: List[str] = None, biomes: str = None, height: int = 2, deposits: bool = False, preset: Optional[str] = None):
     # Factory method to allow default values
-    return Vein(ore, vein_type, rarity, size, min_y, max_y, density, poor, normal, rich, rocks, spoiler_ore, spoiler_rarity, spoiler_rocks, biomes, height, deposits)
+    return Vein(ore, vein_type, rarity, size, min_y, max_y, density, poor, normal, rich, rocks, spoiler_ore, spoiler_rarity, spoiler_rocks, biomes, height, deposits, preset)
 
 
 def preset_vein(ore: str, vein_type: str, rocks: List[str], spoiler_ore: Optional[str] = None, spoiler_rarity: int = 0, spoiler_rocks: List[str] = None,
-                biomes: str = None, height: int = 2, preset: Tuple[int, int, int, int, int, int, int, int] = None, deposits: bool = False):
-    assert preset is not None
-    return Vein(ore, vein_type, preset[0], preset[1], preset[2], preset[3], preset[4], preset[5], preset[6], preset[7], rocks, spoiler_ore, spoiler_rarity, spoiler_rocks, biomes, height, deposits)
+                biomes: str = None, height: int = 2, preset: str = None, deposits: bool = False):
+    # The numbers of a vein from a preset, by its name in PRESETS
+    assert preset in PRESETS, 'Unknown preset: %s' % preset
+    return vein(ore, vein_type, *PRESETS[preset], rocks, spoiler_ore, spoiler_rarity, spoiler_rocks, biomes, height, deposits, preset)
 
 
 # Default parameters for common ore veins
@@ -153,50 +155,62 @@ REALLY_HIGH_MINERAL_ORE = (15, 15, 120, 210, 80, 0, 0, 0)
 DEEP_COAL_ORE = (90, 25, -48, 100, 90, 0, 0, 0)
 HIGH_COAL_ORE = (90, 25, 0, 210, 90, 0, 0, 0)
 
+# Presets by name, for vein definitions loaded from files, see vein_data.py
+PRESETS: Dict[str, Tuple[int, int, int, int, int, int, int, int]] = {
+    'REALLY_DEEP_METAL_ORE': REALLY_DEEP_METAL_ORE,
+    'HIGH_METAL_ORE': HIGH_METAL_ORE,
+    'REALLY_DEEP_MINERAL_ORE': REALLY_DEEP_MINERAL_ORE,
+    'DEEP_MINERAL_ORE': DEEP_MINERAL_ORE,
+    'HIGH_MINERAL_ORE': HIGH_MINERAL_ORE,
+    'REALLY_HIGH_MINERAL_ORE': REALLY_HIGH_MINERAL_ORE,
+    'DEEP_COAL_ORE': DEEP_COAL_ORE,
+    'HIGH_COAL_ORE': HIGH_COAL_ORE,
+}
+
 HIGH_ORE_VEINS: Dict[str, Vein] = {
-    'high_hematite': preset_vein('hematite', 'cluster', ['igneous_extrusive'], preset=HIGH_METAL_ORE),
-    'high_native_copper': preset_vein('native_copper', 'cluster', ['igneous_extrusive'], preset=HIGH_METAL_ORE),
-    'high_magnetite': preset_vein('magnetite', 'cluster', ['sedimentary'], preset=HIGH_METAL_ORE),
-    'high_limonite': preset_vein('limonite', 'cluster', ['sedimentary'], 'ruby', 20, ['limestone', 'shale'], preset=HIGH_METAL_ORE),
+    'high_hematite': preset_vein('hematite', 'cluster', ['igneous_extrusive'], preset='HIGH_METAL_ORE'),
+    'high_native_copper': preset_vein('native_copper', 'cluster', ['igneous_extrusive'], preset='HIGH_METAL_ORE'),
+    'high_magnetite': preset_vein('magnetite', 'cluster', ['sedimentary'], preset='HIGH_METAL_ORE'),
+    'high_limonite': preset_vein('limonite', 'cluster', ['sedimentary'], 'ruby', 20, ['limestone', 'shale'], preset='HIGH_METAL_ORE'),
 }
 
 #dropped all sedimentary only veins here, since they'll never spawn in the bottom layer
 DEEP_ORE_VEINS: Dict[str, Vein] = {
-    'really_deep_gold': preset_vein('native_gold', 'cluster', ['igneous_intrusive'], 'pyrite', 20, ['igneous_intrusive'], preset=REALLY_DEEP_METAL_ORE),
-    'really_deep_silver': preset_vein('native_silver', 'cluster', ['granite', 'gneiss'], preset=REALLY_DEEP_METAL_ORE),
-    'really_deep_cassiterite': preset_vein('cassiterite', 'cluster', ['igneous_intrusive'], 'topaz', 10, ['granite'], preset=REALLY_DEEP_METAL_ORE),
-    'really_deep_bismuthinite': preset_vein('bismuthinite', 'cluster', ['igneous_intrusive'], preset=REALLY_DEEP_METAL_ORE),
-    'really_deep_garnierite': preset_vein('garnierite', 'cluster', ['gabbro'], preset=REALLY_DEEP_METAL_ORE),
-    'really_deep_malachite': preset_vein('malachite', 'cluster', ['marble'], preset=REALLY_DEEP_METAL_ORE),
-    'really_deep_sphalerite': preset_vein('sphalerite', 'cluster', ['metamorphic'], preset=REALLY_DEEP_METAL_ORE),
-    'really_deep_tetrahedrite': preset_vein('tetrahedrite', 'cluster', ['metamorphic'], preset=REALLY_DEEP_METAL_ORE),
+    'really_deep_gold': preset_vein('native_gold', 'cluster', ['igneous_intrusive'], 'pyrite', 20, ['igneous_intrusive'], preset='REALLY_DEEP_METAL_ORE'),
+    'really_deep_silver': preset_vein('native_silver', 'cluster', ['granite', 'gneiss'], preset='REALLY_DEEP_METAL_ORE'),
+    'really_deep_cassiterite': preset_vein('cassiterite', 'cluster', ['igneous_intrusive'], 'topaz', 10, ['granite'], preset='REALLY_DEEP_METAL_ORE'),
+    'really_deep_bismuthinite': preset_vein('bismuthinite', 'cluster', ['igneous_intrusive'], preset='REALLY_DEEP_METAL_ORE'),
+    'really_deep_garnierite': preset_vein('garnierite', 'cluster', ['gabbro'], preset='REALLY_DEEP_METAL_ORE'),
+    'really_deep_malachite': preset_vein('malachite', 'cluster', ['marble'], preset='REALLY_DEEP_METAL_ORE'),
+    'really_deep_sphalerite': preset_vein('sphalerite', 'cluster', ['metamorphic'], preset='REALLY_DEEP_METAL_ORE'),
+    'really_deep_tetrahedrite': preset_vein('tetrahedrite', 'cluster', ['metamorphic'], preset='REALLY_DEEP_METAL_ORE'),
 }
 
 #spawn rates tweaked or not, these are here for indicator rock settings
 MINERAL_VEINS: Dict[str, Vein] = {
-    'high_sulfur': preset_vein('sulfur', 'cluster', ['igneous_extrusive'], 'gypsum', 20, ['rhyolite'], preset=REALLY_HIGH_MINERAL_ORE),
-    'bituminous_coal': preset_vein('bituminous_coal', 'disc', ['sedimentary'], preset=DEEP_COAL_ORE, height=3),
-    'lignite': preset_vein('lignite', 'disc', ['sedimentary'], preset=HIGH_COAL_ORE, height=3),
-    'kaolinite': preset_vein('kaolinite', 'cluster', ['sedimentary'], preset=HIGH_MINERAL_ORE),
-    'graphite': preset_vein('graphite', 'cluster', ['gneiss', 'marble', 'quartzite', 'schist'], preset=DEEP_MINERAL_ORE),
-    'cinnabar': preset_vein('cinnabar', 'cluster', ['igneous_extrusive', 'quartzite', 'shale'], 'opal', 10, ['quartzite'], preset=DEEP_MINERAL_ORE),
-    'cryolite': preset_vein('cryolite', 'cluster', ['granite'], preset=DEEP_MINERAL_ORE),
-    'saltpeter': preset_vein('saltpeter', 'cluster', ['sedimentary'], 'gypsum', 10, ['limestone'], preset=DEEP_MINERAL_ORE),
-    'sulfur': preset_vein('sulfur', 'cluster', ['igneous_extrusive'], 'gypsum', 20, ['rhyolite'], preset=HIGH_MINERAL_ORE),
-    'sylvite': preset_vein('sylvite', 'cluster', ['shale', 'claystone', 'chert'], preset=HIGH_MINERAL_ORE),
-    'borax': preset_vein('borax', 'cluster', ['claystone', 'limestone', 'shale'], preset=HIGH_MINERAL_ORE),
+    'high_sulfur': preset_vein('sulfur', 'cluster', ['igneous_extrusive'], 'gypsum', 20, ['rhyolite'], preset='REALLY_HIGH_MINERAL_ORE'),
+    'bituminous_coal': preset_vein('bituminous_coal', 'disc', ['sedimentary'], preset='DEEP_COAL_ORE', height=3),
+    'lignite': preset_vein('lignite', 'disc', ['sedimentary'], preset='HIGH_COAL_ORE', height=3),
+    'kaolinite': preset_vein('kaolinite', 'cluster', ['sedimentary'], preset='HIGH_MINERAL_ORE'),
+    'graphite': preset_vein('graphite', 'cluster', ['gneiss', 'marble', 'quartzite', 'schist'], preset='DEEP_MINERAL_ORE'),
+    'cinnabar': preset_vein('cinnabar', 'cluster', ['igneous_extrusive', 'quartzite', 'shale'], 'opal', 10, ['quartzite'], preset='DEEP_MINERAL_ORE'),
+    'cryolite': preset_vein('cryolite', 'cluster', ['granite'], preset='DEEP_MINERAL_ORE'),
+    'saltpeter': preset_vein('saltpeter', 'cluster', ['sedimentary'], 'gypsum', 10, ['limestone'], preset='DEEP_MINERAL_ORE'),
+    'sulfur': preset_vein('sulfur', 'cluster', ['igneous_extrusive'], 'gypsum', 20, ['rhyolite'], preset='HIGH_MINERAL_ORE'),
+    'sylvite': preset_vein('sylvite', 'cluster', ['shale', 'claystone', 'chert'], preset='HIGH_MINERAL_ORE'),
+    'borax': preset_vein('borax', 'cluster', ['claystone', 'limestone', 'shale'], preset='HIGH_MINERAL_ORE'),
     'gypsum': vein('gypsum', 'disc', 120, 20, 30, 90, 60, 0, 0, 0, ['metamorphic']),
-    'lapis_lazuli': preset_vein('lapis_lazuli', 'cluster', ['limestone', 'marble'], preset=DEEP_MINERAL_ORE),
+    'lapis_lazuli': preset_vein('lapis_lazuli', 'cluster', ['limestone', 'marble'], preset='DEEP_MINERAL_ORE'),
     'halite': vein('halite', 'disc', 120, 30, 30, 90, 80, 0, 0, 0, ['sedimentary']),
     'diamond': vein('diamond', 'pipe', 60, 60, -64, 100, 40, 0, 0, 0, ['gabbro'], 'graphite', 10, ['gabbro']),
     'volcanic_sulfur': vein('sulfur', 'disc', 10, 15, 80, 180, 80, 0, 0, 0, ['igneous_extrusive', 'igneous_intrusive'], biomes='#tfc:is_volcanic', height=6),
 }
 
 DEEP_MINERAL_VEINS = {
-    'deep_graphite': preset_vein('graphite', 'cluster', ['gneiss', 'marble', 'quartzite', 'schist'], preset=REALLY_DEEP_MINERAL_ORE),
-    'deep_cinnabar': preset_vein('cinnabar', 'cluster', ['quartzite'], 'opal', 10, ['quartzite'], preset=REALLY_DEEP_MINERAL_ORE),
-    'deep_cryolite': preset_vein('cryolite', 'cluster', ['granite'], preset=REALLY_DEEP_MINERAL_ORE),
-    'deep_lapis_lazuli': preset_vein('lapis_lazuli', 'cluster', ['marble'], preset=REALLY_DEEP_MINERAL_ORE),
+    'deep_graphite': preset_vein('graphite', 'cluster', ['gneiss', 'marble', 'quartzite', 'schist'], preset='REALLY_DEEP_MINERAL_ORE'),
+    'deep_cinnabar': preset_vein('cinnabar', 'cluster', ['quartzite'], 'opal', 10, ['quartzite'], preset='REALLY_DEEP_MINERAL_ORE'),
+    'deep_cryolite': preset_vein('cryolite', 'cluster', ['granite'], preset='REALLY_DEEP_MINERAL_ORE'),
+    'deep_lapis_lazuli': preset_vein('lapis_lazuli', 'cluster', ['marble'], preset='REALLY_DEEP_MINERAL_ORE'),
     'deep_diamond': vein('diamond', 'pipe', 60, 60, -64, 0, 60, 0, 0, 0, ['gabbro'], 'graphite', 10, ['gabbro']),
     'deep_emerald': vein('emerald', 'pipe', 80, 60, -64, 0, 60, 0, 0, 0, ['igneous_intrusive']),
 }
@@ -2,12 +2,15 @@ import difflib
 import json
 from typing import Tuple
 
+from profiling import phase, written
+
 
 def main(validate: bool, langs: Tuple[str, ...]):
     en_us = load('en_us')
     for lang in langs:
         if lang != 'en_us':
-            format_lang(en_us, lang, validate)
+            with phase(lang):
+                format_lang(en_us, lang, validate)
 
 def update(langs: Tuple[str, ...]):
     en_us = load('en_us')
@@ -77,3 +80,4 @@ def save(lang: str, lang_data, validate: bool):
     else:
         with open('./src/main/resources/assets/tfc/lang/%s.json' % lang, 'w', encoding='utf-8') as f:
             json.dump(lang_data, f, ensure_ascii=False, indent=2)
+        written('./src/main/resources/assets/tfc/lang', ('./src/main/resources/assets/tfc/lang/%s.json' % lang,))
@@ -0,0 +1,162 @@
+# Interning of json fragments which are repeated across generated files
+# Identical fragments (vertical anchors, replace lists, weighted block lists, indicators) are built once, shared by every config which uses them, and serialized once per nesting level, then spliced into each file.
+
+import hashlib
+import json
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from mcresources.type_definitions import Json
+
+
+class FrozenDict(dict):
+    """ A dict which can't be modified, as an interned fragment is shared by every config which uses it """
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+    def immutable(self, *args, **kwargs):
+        raise TypeError('Interned fragments are shared, and must not be modified')
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = immutable
+
+
+class Fragments:
+    """
+    A table of interned fragments, keyed by a hash of their repr(), which is distinct for fragments which serialize differently.
+    Interned fragments are frozen, with dicts as FrozenDicts and lists as tuples, and must not contain None values, so del_none() can return them as is.
+    Nothing is ever removed, so a process which builds more than once must clear() the table, and any caches of fragments, before each build.
+    """
+
+    def __init__(self):
+        self.by_key: Dict[bytes, Json] = {}
+        self.by_id: Dict[int, Json] = {}  # Holds a reference to each fragment, so ids are never reused
+        self.encoded: Dict[Tuple[int, int, int, Callable[[str], str]], str] = {}  # (id, indent, level, string encoder) -> text
+
+    def intern(self, value: Json) -> Json:
+        if id(value) in self.by_id:
+            return value
+        key = hashlib.sha1(repr(value).encode('utf-8')).digest()
+        if key not in self.by_key:
+            value = self.freeze(value)
+            self.by_key[key] = value
+            self.by_id[id(value)] = value
+        return self.by_key[key]
+
+    def freeze(self, value: Json) -> Json:
+        """ A copy of the value which can't be modified, and serializes the same. Interned fragments in it are kept as is """
+        if id(value) in self.by_id:
+            return value
+        if isinstance(value, dict):
+            return FrozenDict((k, self.freeze(v)) for k, v in value.items())
+        if isinstance(value, (list, tuple)):
+            return tuple(self.freeze(v) for v in value)
+        return value
+
+    def used(self, values: Iterable[Json]) -> Tuple[Json, ...]:
+        """ The interned fragments in some values, including those nested in other fragments, to be pickled along with the values """
+        found: Dict[int, Json] = {}
+
+        def visit(value: Json):
+            if id(value) in self.by_id:
+                if id(value) in found:
+                    return
+                found[id(value)] = value
+            if isinstance(value, dict):
+                for v in value.values():
+                    visit(v)
+            elif isinstance(value, (list, tuple)):
+                for v in value:
+                    visit(v)
+
+        for value in values:
+            visit(value)
+        return tuple(found.values())
+
+    def register(self, values: Tuple[Json, ...]):
+        """ Re-interns fragments by identity, after they are unpickled in another process, where they are new objects """
+        for value in values:
+            self.by_id[id(value)] = value
+
+    def clear(self):
+        self.by_key.clear()
+        self.by_id.clear()
+        self.encoded.clear()
+
+
+FRAGMENTS = Fragments()
+
+
+def fragment(value: Json) -> Json:
+    """ Returns the shared instance of a fragment equal to the value """
+    return FRAGMENTS.intern(value)
+
+
+def del_none(data: Json) -> Json:
+    """ utils.del_none(), which keeps interned fragments shared instead of copying them """
+    if id(data) in FRAGMENTS.by_id:
+        return data
+    if isinstance(data, dict):
+        return {k: del_none(v) for k, v in data.items() if v is not None}
+    if isinstance(data, (list, tuple)):
+        return [del_none(v) for v in data if v is not None]
+    if data is None:
+        raise ValueError('None passed to `del_none`, should not be possible.')
+    return data
+
+
+def dumps(data: Json, indent: int = 2, ensure_ascii: bool = False) -> str:
+    """ Identical to json.dumps(data, indent=indent, ensure_ascii=ensure_ascii), but the text of interned fragments is encoded once and spliced in """
+    chunks: List[str] = []
+    encode(data, chunks, indent, 0, json.encoder.encode_basestring_ascii if ensure_ascii else json.encoder.encode_basestring)
+    return ''.join(chunks)
+
+
+def encode(data: Json, chunks: List[str], indent: int, level: int, encode_str: Callable[[str], str]):
+    """ Encodes like the pure python encoder in the json module (which is the one json.dumps() uses whenever an indent is given), with an integer indent and the default separators """
+    if isinstance(data, str):
+        chunks.append(encode_str(data))
+    elif data is None or data is True or data is False:
+        chunks.append(CONSTANTS[data])
+    elif isinstance(data, int):
+        chunks.append(int.__repr__(data))
+    elif isinstance(data, float):
+        chunks.append(json.dumps(data))
+    elif id(data) in FRAGMENTS.by_id:
+        key = id(data), indent, level, encode_str
+        if key not in FRAGMENTS.encoded:
+            text: List[str] = []
+            encode_container(data, text, indent, level, encode_str)
+            FRAGMENTS.encoded[key] = ''.join(text)
+        chunks.append(FRAGMENTS.encoded[key])
+    else:
+        encode_container(data, chunks, indent, level, encode_str)
+
+
+def encode_container(data: Json, chunks: List[str], indent: int, level: int, encode_str: Callable[[str], str]):
+    if isinstance(data, (list, tuple)):
+        if not data:
+            chunks.append('[]')
+            return
+        newline = '\n' + ' ' * (indent * (level + 1))
+        chunks.append('[')
+        for i, value in enumerate(data):
+            chunks.append(newline if i == 0 else ',' + newline)
+            encode(value, chunks, indent, level + 1, encode_str)
+        chunks.append('\n' + ' ' * (indent * level) + ']')
+    elif isinstance(data, dict):
+        if not data:
+            chunks.append('{}')
+            return
+        newline = '\n' + ' ' * (indent * (level + 1))
+        chunks.append('{')
+        for i, (k, value) in enumerate(data.items()):
+            chunks.append(newline if i == 0 else ',' + newline)
+            chunks.append(encode_str(k if isinstance(k, str) else json.dumps(k).strip('"')))
+            chunks.append(': ')
+            encode(value, chunks, indent, level + 1, encode_str)
+        chunks.append('\n' + ' ' * (indent * level) + '}')
+    else:
+        raise TypeError('Object of type %s is not JSON serializable' % type(data).__name__)
+
+
+CONSTANTS = {None: 'null', True: 'true', False: 'false'}
@@ -1,12 +1,12 @@
 import os
-from argparse import ArgumentParser
+from typing import Dict, Iterator, NamedTuple, Optional, Sequence, Tuple
 
 from mcresources import ResourceManager, utils
 from mcresources.type_definitions import ResourceIdentifier, JsonObject
 
-from constants import MINERAL_INDICATORS
 from patchouli import *
 from i18n import I18n
+import vein_table
 
 
 class LocalInstance:
@@ -22,55 +22,117 @@ class LocalInstance:
             return rm
         return None
 
-def main():
+
+class BookTarget(NamedTuple):
+    domain: str
+    resource_dir: str
+    nohints: bool
+
+
+def book_targets() -> Tuple[BookTarget, ...]:
+    """ One book for each variant, see variants.py """
+    import variants
+    return tuple(BookTarget(v.domain, v.resource_dir, not v.hints) for v in variants.variants())
+
+
+def main(languages: Sequence[str] = ('en_us',), validate: bool = False, jobs: Optional[int] = None, local: Optional[str] = None) -> int:
+    """ Builds both books in every language, returning the number of files with errors. The structure of each book is built once, and each language is written by its own worker process """
+    from profiling import phase
+    if local is not None:
+        LocalInstance.INSTANCE_DIR = local
     print('Writing book')
-    i18n = I18n.create('en_us')
-    rm = ResourceManager('tfcgyres_veinbuffs', 'src_veinbuffs')
-    make_book(rm, i18n, nohints=True)
+    with phase('compile'):
+        compiled = compile_books()
+
+    if jobs == 1 or len(languages) == 1:
+        errors = sum(build_language(lang, compiled, validate) for lang in languages)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs or len(languages)) as pool:
+            errors = sum(pool.map(build_language, languages, [compiled] * len(languages), [validate] * len(languages)))
+
+    if not validate:
+        copy_to_local_instance()
 
-    i18n.flush()
+    print('Done')
+    return errors
 
-    i18n = I18n.create('en_us')
-    rm = ResourceManager('tfcgyres_orehints', 'src')
-    make_book(rm, i18n)
 
-    i18n.flush()
+def compile_books() -> Tuple[Tuple[BookTarget, CompiledBook], ...]:
+    indicators = vein_table.table().indicators
+    return tuple((target, declare_book(ResourceManager(target.domain, target.resource_dir), I18n('en_us'), indicators, nohints=target.nohints).compile()) for target in book_targets())
 
 
+def copy_to_local_instance() -> Optional[ResourceManager]:
+    """ Writes the book into the local instance, if there is one """
+    from writer import BufferedResourceManager
+    rm = BufferedResourceManager('tfcgyres_orehints', 'src')
     if LocalInstance.wrap(rm):
         print('Copying into local instance at: %s' % LocalInstance.INSTANCE_DIR)
         make_book(rm, I18n.create('en_us'), local_instance=True)
+        rm.flush()
+        return rm
+    return None
+
+
+def build_language(lang: str, compiled: Sequence[Tuple[BookTarget, CompiledBook]], validate: bool) -> int:
+    """ Translates and writes every book in a single language. Runs in a worker process """
+    from profiling import phase, written
+    from writer import BufferedResourceManager
+    with phase(lang):
+        i18n = I18n.create(lang)
+        errors = 0
+        for target, book in compiled:
+            if validate:
+                from validation import ValidatingResourceManager
+                rm = ValidatingResourceManager(target.domain, target.resource_dir)
+            else:
+                rm = BufferedResourceManager(target.domain, target.resource_dir)
+            with phase(target.domain):
+                Book(rm, book.root_name, {}, i18n, False, reverse_translate=False).build(book)
+                with phase('flush'):
+                    rm.flush()
+            written(target.resource_dir, rm.written_files)
+            errors += rm.error_files
+
+        if not validate:
+            i18n.flush()
+    return errors
 
-    print('Done')
 
 def make_book(rm: ResourceManager, i18n: I18n, local_instance: bool = False, nohints = False):
+    declare_book(rm, i18n, vein_table.table().indicators, local_instance, nohints).build()
+
+
+def book_records(domain: str, indicators: Dict[str, str], nohints: bool = False) -> Iterator['stream.Record']:
+    """ Every file of the book in a domain, in the root language, without writing anything. See Book.records() """
+    return declare_book(ResourceManager(domain, '.'), I18n('en_us'), indicators, nohints=nohints).records()
+
+
+def declare_book(rm: ResourceManager, i18n: I18n, indicators: Dict[str, str], local_instance: bool = False, nohints = False) -> Book:
+    """ The book of a variant. indicators are the hint rock of each mineral, as in the vein table """
     buff_desc = "Some of the current veins were too small and too rare.$(br2)Coal veins are now much larger horizontal discs with fewer inclusions. Most other mineral veins are larger and more common, but occur at the same depths."
     ore_desc = '$(bold)Ore Veins on the Brink$()$(br2)Exploring the depths and heights of the world may be more rewarding! New veins below y-level 0 now exist for all metamorphic and igneous intrusive ores: metal, mineral, and diamonds/emeralds. These veins may be larger, denser, and purer.$(br2)In the mountains, new dense iron, copper and sulfur veins spawn.'
     ore_summary = 'Ore veins are enriched, especially at the top and bottom of the world.'
+    book = Book(rm, 'field_guide', {}, i18n, local_instance, reverse_translate=False)  # In the domain of the resource manager, which is the domain of the variant
     if nohints:
-        rm.domain = 'tfcgyres_veinbuffs'  # DOMAIN CHANGE
-        book = Book(rm, 'field_guide', {}, i18n, local_instance, reverse_translate=False)
-
-        book.category('tfcgyres_veinbuffs', 'Ore Spawning', ore_summary, 'tfc:metal/propick/steel', is_sorted=True, entries=(
+        book.category(rm.domain, 'Ore Spawning', ore_summary, 'tfc:metal/propick/steel', is_sorted=True, entries=(
             entry('veinbuffs', 'Ore Vein Tweaks', 'tfc:ore/graphite', pages=(
                 text('Ore veins seem too difficult to find, so why not make it a bit easier? ' + buff_desc),
                 text(ore_desc))),
         ))
 
     else:
-        rm.domain = 'tfcgyres_orehints'  # DOMAIN CHANGE
-        book = Book(rm, 'field_guide', {}, i18n, local_instance, reverse_translate=False)
-
-        book.category('tfcgyres_orehints', 'Ore Hints and Spawning', 'Mineral veins now have hint rocks like metal veins have small nuggets! ' + ore_summary + '$(br2)Thanks to AnodeCathode of TechNodeFirmaCraft for the "hint rock" idea and initial rock selections.', 'tfc:metal/propick/steel', is_sorted=True, entries=(
+        book.category(rm.domain, 'Ore Hints and Spawning', 'Mineral veins now have hint rocks like metal veins have small nuggets! ' + ore_summary + '$(br2)Thanks to AnodeCathode of TechNodeFirmaCraft for the "hint rock" idea and initial rock selections.', 'tfc:metal/propick/steel', is_sorted=True, entries=(
             entry('orehints', 'Mineral Hints', 'tfc:ore/kaolinite', pages=(
                 text('Finding TFC mineral veins is easier. Hint rocks now generate in the world above mineral veins just like small metal nuggets from metal ores.$(br)Look for these rocks on the surface where they don\'t belong, and there\'s likely a mineral vein beneath!'),
-                text('$(bold){:_<12s}'.format('Ore') + '{:_>16s}'.format('Hint Rock$(br)') +'$()'+''.join([('{0:_<16s}{1:_>10s}').format(min, MINERAL_INDICATORS[min]).title()+'$(br)' for min in MINERAL_INDICATORS])))),
+                text('$(bold){:_<12s}'.format('Ore') + '{:_>16s}'.format('Hint Rock$(br)') +'$()'+''.join([('{0:_<16s}{1:_>10s}').format(min, indicators[min]).title()+'$(br)' for min in indicators])))),
             entry('veinbuffs', 'Ore Vein Tweaks', 'tfc:ore/graphite', pages=(
                 text('Adding hint rocks touched the mineral vein definitions, so why not make them better? ' + buff_desc),
                 text(ore_desc))),
         ))
 
-    book.build()
+    return book
 
 
 
@@ -0,0 +1,140 @@
+# Estimates the surface density of vein hints over a synthetic chunk grid, and how often a hint has a vein beneath it at a minable depth
+# Used to judge if hints are too rare, or too noisy, without booting a server. Requires numpy.
+#
+# Hints are the 'indicator' of each vein config, as generated by world_gen.py: loose rocks above mineral veins, and small ores above high ore veins.
+# The model is an approximation of TFC's vein indicators:
+# - The world is split into square cells of ROCK_CELL chunks, each with one rock, and a surface height between SURFACE_MIN and SURFACE_MAX
+# - Every chunk rolls each vein once, spawning with chance 1 / rarity, centered at a uniform y in [min_y, max_y], as in simulate.py
+# - If the vein is in one of its rocks, and its center is at most INDICATOR_DEPTH below the surface, each ore block places a hint with chance 1 / indicator rarity
+# - Hints are counted in the chunk of the vein, ignoring the indicator spread
+# - Loose rocks also generate naturally, loose_rocks per chunk of the surface rock, and are identical to loose rock hints
+# - A hint is reliable if the vein which placed it is centered at most minable_depth below the surface
+
+import csv
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from vein_table import CompiledVein, VeinTable
+import simulate
+import vein_table
+
+ROCK_CELL = 8
+SURFACE_MIN = 63
+SURFACE_MAX = 160
+SURFACE_JITTER = 8  # Height variation within a rock cell
+INDICATOR_DEPTH = 35  # TFC's default indicator depth
+LOOSE_ROCK = 'tfc:rock/loose/'
+VOLUME_SAMPLES = 1 << 12  # Sampled veins used for the expected ore blocks of each vein
+BATCH_SIZE = 1 << 20  # Spawned veins per array op
+
+
+class HintEstimate(NamedTuple):
+    hints: Tuple[str, ...]  # Hint block ids
+    ores: Tuple[Tuple[str, ...], ...]  # (hints,) the ores of the veins placing each hint
+    region: int  # Side length, in chunks, of the regions. The requested size, rounded up to a whole number of rock cells
+    region_chunks: np.ndarray  # (regions,) chunks in each region
+    placed: np.ndarray  # (hints, regions) hints placed by veins in each region
+    reliable: np.ndarray  # (hints, regions) hints placed by veins at a minable depth in each region
+    natural: np.ndarray  # (hints, regions) naturally generated loose rocks, identical to a hint, in each region
+
+    def per_chunk(self, counts: np.ndarray) -> np.ndarray:
+        """ Converts (hints, regions) counts to the mean per chunk of each region """
+        return counts / self.region_chunks
+
+    def reliability(self) -> np.ndarray:
+        """ (hints,) the chance that a found hint block has a vein beneath it at a minable depth """
+        found = self.placed.sum(axis=1) + self.natural.sum(axis=1)
+        return np.divide(self.reliable.sum(axis=1), found, out=np.zeros(len(self.hints)), where=found > 0)
+
+
+def estimate(table: VeinTable, chunks: int, region: int = 32, loose_rocks: float = 4, minable_depth: int = 24, seed: int = 0, rock_weights: Optional[Dict[str, float]] = None) -> HintEstimate:
+    """
+    Estimates the hints over a square grid of chunks x chunks, split into square regions of region x region chunks, rounded up to a whole number of rock cells.
+    Spawns are drawn for every chunk, but each vein places its expected number of hints, which is precomputed from its mean ore volume.
+    :param rock_weights: The relative abundance of each rock. Defaults to all rocks being equally common.
+    """
+    import world_gen
+
+    rng = np.random.default_rng(seed)
+    rock_names = tuple(table.rocks.keys())
+    weights = np.array([1.0 if rock_weights is None else rock_weights.get(r, 0) for r in rock_names])
+    weights /= weights.sum()
+
+    # Rock cells, and the region each cell is in. Regions are rounded up to a whole number of cells
+    region = max(ROCK_CELL, -(-region // ROCK_CELL) * ROCK_CELL)
+    cells = -(-chunks // ROCK_CELL)
+    regions = -(-chunks // region)
+    cell_start = np.arange(cells) * ROCK_CELL
+    cell_rock = rng.choice(len(rock_names), size=cells * cells, p=weights)
+    cell_surface = rng.uniform(SURFACE_MIN, SURFACE_MAX, size=cells * cells)
+    cell_region = ((cell_start // region)[:, None] * regions + (cell_start // region)[None, :]).ravel()
+    cell_chunks = np.outer(np.minimum(ROCK_CELL, chunks - cell_start), np.minimum(ROCK_CELL, chunks - cell_start)).ravel()
+    region_chunks = np.bincount(cell_region, weights=cell_chunks, minlength=regions * regions)
+
+    # Hints, from the vein configs
+    model = {f.name: f for f in world_gen.build_model(table).features}
+    hinted: List[Tuple[CompiledVein, int, int]] = []  # (vein, hint index, indicator rarity)
+    hints: Dict[str, int] = {}
+    ores: Dict[str, List[str]] = {}
+    for v in table.veins:
+        indicator = model[v.name].config.get('indicator')
+        if indicator is None:
+            continue
+        block = indicator['blocks'][0]['block']
+        hinted.append((v, hints.setdefault(block, len(hints)), indicator['rarity']))
+        if v.vein.ore not in ores.setdefault(block, []):
+            ores[block].append(v.vein.ore)
+
+    placed = np.zeros((len(hints), regions * regions))
+    reliable = np.zeros((len(hints), regions * regions))
+    natural = np.zeros((len(hints), regions * regions))
+    whole_world = np.array([-np.inf, np.inf])
+
+    for v, h, indicator_rarity in hinted:
+        vein = v.vein
+        hints_per_vein = simulate.vein_band_volumes(v, rng, VOLUME_SAMPLES, whole_world).mean() * vein.density * 0.01 / indicator_rarity
+        matches = np.isin(np.arange(len(rock_names)), [rock_names.index(r) for r in v.rocks])
+        n = int(rng.binomial(chunks * chunks, 1 / vein.rarity))
+        for start in range(0, n, BATCH_SIZE):
+            size = min(BATCH_SIZE, n - start)
+            x = rng.integers(0, chunks, size=size)
+            z = rng.integers(0, chunks, size=size)
+            cell = (x // ROCK_CELL) * cells + z // ROCK_CELL
+            depth = cell_surface[cell] + rng.uniform(-SURFACE_JITTER, SURFACE_JITTER, size=size) - rng.integers(vein.min_y, vein.max_y, size=size, endpoint=True)
+            near = matches[cell_rock[cell]] & (depth >= 0) & (depth <= INDICATOR_DEPTH)
+            in_region = (x // region) * regions + z // region
+            placed[h] += np.bincount(in_region, weights=near * hints_per_vein, minlength=regions * regions)
+            reliable[h] += np.bincount(in_region, weights=(near & (depth <= minable_depth)) * hints_per_vein, minlength=regions * regions)
+
+    for block, h in hints.items():
+        if block.startswith(LOOSE_ROCK) and block[len(LOOSE_ROCK):] in rock_names:
+            rock = rock_names.index(block[len(LOOSE_ROCK):])
+            natural[h] = loose_rocks * np.bincount(cell_region, weights=cell_chunks * (cell_rock == rock), minlength=regions * regions)
+
+    return HintEstimate(tuple(hints), tuple(tuple(ores[b]) for b in hints), region, region_chunks, placed, reliable, natural)
+
+
+def main(chunks: int, region: int, loose_rocks: float, minable_depth: int, seed: int, output: Optional[str]):
+    table: VeinTable = vein_table.table()
+    result = estimate(table, chunks, region, loose_rocks, minable_depth, seed)
+
+    per_chunk = result.per_chunk(result.placed)
+    per_region = result.placed / (result.region_chunks / (result.region * result.region))  # Hints in a full region
+    print('Estimated hints over %d x %d chunks, in regions of %d x %d chunks, with %.1f natural loose rocks per chunk' % (chunks, chunks, result.region, result.region, loose_rocks))
+    print('%-32s %12s %10s %10s %12s %12s   %s' % ('Hint', 'Hint / Chunk', 'P10 Region', 'P90 Region', 'No Hints', 'Reliability', 'Ores'))
+    for i, hint in enumerate(result.hints):
+        p10, p90 = np.percentile(per_region[i], (10, 90))
+        print('%-32s %12.4f %10.1f %10.1f %11.1f%% %11.1f%%   %s' % (
+            hint, per_chunk[i].mean(), p10, p90, 100 * (per_region[i] < 1).mean(), 100 * result.reliability()[i], ', '.join(result.ores[i])
+        ))
+    print('No Hints = regions with less than one hint expected. Reliability = chance a found hint block has a vein beneath it, at most %d blocks below the surface' % minable_depth)
+
+    if output is not None:
+        with open(output, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['hint', 'ores', 'region', 'chunks', 'placed', 'reliable', 'natural'])
+            for i, hint in enumerate(result.hints):
+                for r in range(len(result.region_chunks)):
+                    writer.writerow([hint, ' '.join(result.ores[i]), r, int(result.region_chunks[r]), '%.4f' % result.placed[i, r], '%.4f' % result.reliable[i, r], '%.4f' % result.natural[i, r]])
+        print('Wrote hints per region to %s' % output)
@@ -1,5 +1,10 @@
 import os
+import sys
 import json
+import marshal
+from typing import Dict, Tuple
+
+CACHE_VERSION = 1
 
 
 class I18n:
@@ -25,7 +30,6 @@ class I18n:
 class ForLanguage(I18n):
     def __init__(self, lang: str):
         super().__init__(lang)
-        self.before = {}
         self.after = {}
         self.lang_path = './lang/%s.json' % lang
 
@@ -35,17 +39,8 @@ class ForLanguage(I18n):
             with open(self.lang_path, 'w', encoding='utf-8') as f:
                 f.write('{}\n')
 
-        # Read the existing translation
-        with open(self.lang_path, 'r', encoding='utf-8') as f:
-            print('Reading translation for language %s to %s' % (self.lang, self.lang_path))
-            j = json.load(f)
-
-        # Parse json
-        for key, value in j.items():
-            if not isinstance(value, str):
-                print('Illegal translation entry: "%s": "%s"' % (key, value))
-                exit(-1)
-            self.before[key] = value
+        # Read the existing translation. This is shared with every other translation of this language, so must not be modified
+        self.before = load_catalog(self.lang_path, self.lang)
 
     def translate(self, text: str) -> str:
         if text in self.before:
@@ -57,7 +52,86 @@ class ForLanguage(I18n):
         return translated
 
     def flush(self):
-        with open(self.lang_path, 'w', encoding='utf-8') as f:
-            print('Writing updated translation for language %s' % self.lang)
-            json.dump(self.after, f, indent=2, ensure_ascii=False)
+        if list(self.after.items()) == list(self.before.items()):
+            return  # Nothing to update, including the order of entries
+        print('Writing updated translation for language %s' % self.lang)
+        text = json.dumps(self.after, indent=2, ensure_ascii=False)
+        write_atomic(self.lang_path, text)
+        store_catalog(self.lang_path, dict(self.after))
+
+
+# Translation Catalogs
+# Parsed translation files are kept in memory, shared by every I18n in this process, and in a binary cache next to the translation, keyed by the file's modification time and size.
+
+CATALOGS: Dict[str, Tuple[Tuple[int, int], Dict[str, str]]] = {}
+
+
+def load_catalog(path: str, lang: str) -> Dict[str, str]:
+    key = file_key(path)
+    if path in CATALOGS and CATALOGS[path][0] == key:
+        return CATALOGS[path][1]
+
+    catalog = read_cache(path, key)
+    if catalog is None:
+        with open(path, 'r', encoding='utf-8') as f:
+            print('Reading translation for language %s to %s' % (lang, path))
+            j = json.load(f)
+
+        # Parse json
+        catalog = {}
+        for k, value in j.items():
+            if not isinstance(value, str):
+                print('Illegal translation entry: "%s": "%s"' % (k, value))
+                exit(-1)
+            catalog[k] = value
+        write_cache(path, key, catalog)
+
+    CATALOGS[path] = key, catalog
+    return catalog
+
+
+def store_catalog(path: str, catalog: Dict[str, str]):
+    """ Records the content of a translation file that was just written, so it doesn't need to be read again """
+    key = file_key(path)
+    CATALOGS[path] = key, catalog
+    write_cache(path, key, catalog)
+
+
+def file_key(path: str) -> Tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def cache_path(path: str) -> str:
+    return os.path.join(os.path.dirname(path), '.cache', os.path.basename(path) + '.bin')
+
+
+def read_cache(path: str, key: Tuple[int, int]) -> Dict[str, str] | None:
+    try:
+        with open(cache_path(path), 'rb') as f:
+            version, python, cached_key, catalog = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version == CACHE_VERSION and python == tuple(sys.version_info[:2]) and tuple(cached_key) == key:
+        return catalog
+    return None
+
+
+def write_cache(path: str, key: Tuple[int, int], catalog: Dict[str, str]):
+    try:
+        os.makedirs(os.path.dirname(cache_path(path)), exist_ok=True)
+        write_atomic(cache_path(path), marshal.dumps((CACHE_VERSION, tuple(sys.version_info[:2]), key, catalog)))
+    except OSError:
+        pass  # The cache is optional
+
 
+def write_atomic(path: str, content: str | bytes):
+    """ Writes to a temporary file, then replaces the target, so a reader never sees a partial file """
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    if isinstance(content, str):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    else:
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+    os.replace(tmp_path, path)
@@ -0,0 +1,137 @@
+# Incremental resource generation, driven by a manifest of content hashes
+
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from typing import Dict, Optional, Sequence
+
+from mcresources import ResourceManager
+from mcresources.type_definitions import Json
+
+from writer import BufferedResourceManager
+import fragments
+
+MANIFEST_NAME = '.manifest.json'
+MANIFEST_VERSION = 1
+
+
+def canonical(data: Json) -> str:
+    """ A serialization that is independent of key order and formatting, used for hashing """
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def content_hash(data: Json) -> str:
+    return hashlib.sha1(canonical(data).encode('utf-8')).hexdigest()
+
+
+def inputs_hash(*inputs) -> str:
+    """ Hashes a tuple of generator inputs (vein tuples, rock tables, flags...) by their repr(), which is stable for the builtin and NamedTuple types used """
+    return hashlib.sha1(repr(inputs).encode('utf-8')).hexdigest()
+
+
+class Manifest:
+    """
+    Records, for every file generated into a resource dir, the hash of its canonical content and the hash of the inputs that produced it.
+    Paths are stored relative to the resource dir.
+    """
+
+    def __init__(self, resource_dir: str, load: bool = True):
+        self.path = os.path.join(resource_dir, MANIFEST_NAME)
+        self.before: Dict[str, Dict[str, Optional[str]]] = {}
+        self.after: Dict[str, Dict[str, Optional[str]]] = {}
+
+        if load and os.path.isfile(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                j = json.load(f)
+            if j.get('version') == MANIFEST_VERSION:
+                self.before = j['files']
+
+    def fresh(self, key: str, full_path: str, inputs: Optional[str]) -> bool:
+        """ If the file at key was generated from the same inputs, and still exists """
+        entry = self.before.get(key)
+        return inputs is not None and entry is not None and entry['inputs'] == inputs and os.path.isfile(full_path)
+
+    def matches(self, key: str, full_path: str, digest: str) -> bool:
+        """ If the file at key was last written with the same content, and still exists """
+        entry = self.before.get(key)
+        return entry is not None and entry['hash'] == digest and os.path.isfile(full_path)
+
+    def record(self, key: str, digest: str, inputs: Optional[str]):
+        self.after[key] = {'hash': digest, 'inputs': inputs}
+
+    def keep(self, key: str):
+        self.after[key] = self.before[key]
+
+    def orphans(self) -> Sequence[str]:
+        return sorted(k for k in self.before if k not in self.after)
+
+    def save(self):
+        if self.after != self.before:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({'version': MANIFEST_VERSION, 'files': self.after}, f, indent=2, sort_keys=True)
+
+
+class IncrementalResourceManager(BufferedResourceManager):
+    """
+    A resource manager which skips files whose inputs, or content, are unchanged since the last run without reading them from disk. Other files are written concurrently, see writer.py
+    Call finish() after the last flush() to delete orphaned files and save the manifest.
+    """
+
+    def __init__(self, domain: str, resource_dir: str, force: bool = False):
+        super().__init__(domain, resource_dir)
+        self.manifest = Manifest(self.resource_dir, load=not force)
+        self.current_inputs: Optional[str] = None
+        self.deleted_files = 0
+
+    def write(self, path_parts: Sequence[str], data: Json):
+        path = os.path.normpath(os.path.join(self.resource_dir, *path_parts)) + '.json'
+        key = os.path.relpath(path, self.resource_dir).replace(os.sep, '/')
+        inputs = self.current_inputs
+
+        if self.manifest.fresh(key, path, inputs):
+            # Inputs are identical, so don't even serialize the data
+            self.manifest.keep(key)
+            self.written_files.add(path)
+            self.unchanged_files += 1
+            return
+
+        data = fragments.del_none({'__comment__': 'This file was automatically created by mcresources', **data})
+        digest = content_hash(data)
+        self.manifest.record(key, digest, inputs)
+        self.written_files.add(path)
+        if self.manifest.matches(key, path, digest):
+            self.unchanged_files += 1
+        else:
+            self.write_json(path, data)
+
+    def finish(self):
+        """ Deletes any files generated by a previous run but not this one, and saves the manifest """
+        for key in self.manifest.orphans():
+            path = os.path.join(self.resource_dir, key)
+            if os.path.isfile(path):
+                os.remove(path)
+                self.deleted_files += 1
+            remove_empty_dirs(os.path.dirname(path), self.resource_dir)
+        self.manifest.save()
+
+
+@contextmanager
+def inputs(rm: ResourceManager, key: str):
+    """ Marks all writes within this block as produced by the given inputs. Only used by an incremental resource manager """
+    if isinstance(rm, IncrementalResourceManager):
+        rm.current_inputs = key
+        try:
+            yield
+        finally:
+            rm.current_inputs = None
+    else:
+        yield
+
+
+def remove_empty_dirs(path: str, root: str):
+    root = os.path.normpath(root)
+    path = os.path.normpath(path)
+    while path != root and path.startswith(root) and os.path.isdir(path) and not os.listdir(path):
+        os.rmdir(path)
+        path = os.path.dirname(path)
@@ -0,0 +1,141 @@
+# Packages generated resources straight into the mod jars, without writing them to disk first
+# Jars are reproducible: entries are sorted, with fixed timestamps, permissions and compression level, so the same inputs always give the same bytes.
+# Each jar records a hash of its inputs in the zip comment, and is only rebuilt when that hash changes.
+
+import hashlib
+import io
+import os
+import zipfile
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from manifest import canonical, inputs_hash
+from variants import Variant
+import constants
+import fragments
+import generate_book
+import i18n
+import manifest
+import patchouli
+import stream
+import variants
+import vein_table
+import world_gen
+
+
+STATIC_FILES = ('META-INF/mods.toml', 'pack.mcmeta', 'pack.png')
+MANIFEST = b'Manifest-Version: 1.0\r\nCreated-By: TFCGyres resources\r\n\r\n'
+ZIP_TIME = (1980, 1, 1, 0, 0, 0)  # The earliest time a zip entry can have
+COMPRESS_LEVEL = 9
+INPUTS_COMMENT = b'inputs '
+SOURCES = (__file__, constants.__file__, fragments.__file__, generate_book.__file__, i18n.__file__, manifest.__file__, patchouli.__file__, stream.__file__, variants.__file__)  # Which generate jar content. Vein configs have their own inputs, see world_gen.vein_inputs()
+
+
+class Packaged(NamedTuple):
+    size: int  # Of the jar
+    files: int
+    json_size: int  # Of the generated files, uncompressed
+    dev_size: int  # Of the jar, with the generated files in the dev layout
+    dev_json_size: int
+
+
+class JarFiles:
+    """
+    Serialized files in memory, keyed by their path within the jar, collected from streams of records (see stream.py).
+    In release mode, files are minified, without the comment, and with sorted keys. The dev layout is kept alongside, to compare against.
+    """
+
+    def __init__(self, release: bool = False):
+        self.release = release
+        self.files: Dict[str, bytes] = {}
+        self.dev_files: Dict[str, bytes] = {}  # Only in release mode
+
+    def add(self, records: Iterable[stream.Record]):
+        for path, data in records:
+            text = fragments.dumps(data).encode('utf-8')
+            if self.release:
+                self.dev_files[path] = text
+                text = canonical({k: v for k, v in data.items() if k != '__comment__'}).encode('utf-8')
+            self.files[path] = text
+
+
+def main(version: str, output_dir: str = '.', release: bool = False, force: bool = False):
+    selected = variants.variants()
+    models = variants.build_models(selected)
+    for variant in selected:
+        path = os.path.join(output_dir, variant.jar % version)
+        result = package(path, variant, models[variant.name], release, force)
+        if result is None:
+            print('Unchanged %s' % path)
+            continue
+        print('Packaged %s: %d files, %d bytes' % (path, result.files, result.size))
+        if release:
+            print('  Release layout saved %d bytes (%.1f%%) of json, and %d bytes (%.1f%%) of the jar' % (
+                result.dev_json_size - result.json_size, 100 * (1 - result.json_size / result.dev_json_size),
+                result.dev_size - result.size, 100 * (1 - result.size / result.dev_size)))
+
+
+def package(path: str, variant: Variant, model: Optional[world_gen.VeinModel] = None, release: bool = False, force: bool = False) -> Optional[Packaged]:
+    """ Generates the world gen and book of a variant, and writes it, together with the static files, as a single zip. Returns None if the jar is up to date with its inputs """
+    if model is None:
+        model = variants.build_models((variant,))[variant.name]
+    indicators = vein_table.table().indicators  # The book lists the hint rock of each mineral
+    digest = jar_inputs(variant, model, indicators, release)
+    if not force and read_inputs(path) == digest:
+        return None
+
+    jar = JarFiles(release)
+    jar.add(world_gen.records(model, variant.hints))
+    jar.add(generate_book.book_records(variant.domain, indicators, nohints=not variant.hints))
+
+    content = zip_jar(variant, jar.files, digest)
+    with open(path, 'wb') as f:
+        f.write(content)
+
+    json_size = sum(len(text) for text in jar.files.values())
+    if release:
+        return Packaged(len(content), len(jar.files) + len(STATIC_FILES), json_size, len(zip_jar(variant, jar.dev_files)), sum(len(text) for text in jar.dev_files.values()))
+    return Packaged(len(content), len(jar.files) + len(STATIC_FILES), json_size, len(content), json_size)
+
+
+def jar_inputs(variant: Variant, model: world_gen.VeinModel, indicators: Dict[str, str], release: bool) -> str:
+    """ A hash of everything that produces the content of a jar """
+    files = []
+    for path in SOURCES + tuple(os.path.join(variant.resource_dir, name) for name in STATIC_FILES):
+        with open(path, 'rb') as f:
+            files.append(hashlib.sha1(f.read()).hexdigest())
+    return inputs_hash(files, variant, release, model.tag_values, tuple(feature.inputs for feature in model.features), tuple(indicators.items()))
+
+
+def read_inputs(path: str) -> Optional[str]:
+    """ The inputs hash recorded in an existing jar, if any """
+    try:
+        with zipfile.ZipFile(path) as zf:
+            comment = zf.comment
+    except (OSError, zipfile.BadZipFile):
+        return None
+    return comment[len(INPUTS_COMMENT):].decode('ascii', 'replace') if comment.startswith(INPUTS_COMMENT) else None
+
+
+def zip_jar(variant: Variant, files: Dict[str, bytes], digest: Optional[str] = None) -> bytes:
+    """ Zips the manifest, followed by every other file sorted by name, with fixed metadata """
+    entries = dict(files)
+    for name in STATIC_FILES:
+        with open(os.path.join(variant.resource_dir, name), 'rb') as f:
+            entries[name] = f.read()
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        write_entry(zf, 'META-INF/MANIFEST.MF', MANIFEST)  # Must be the first entry of a jar
+        for name in sorted(entries):
+            write_entry(zf, name, entries[name])
+        if digest is not None:
+            zf.comment = INPUTS_COMMENT + digest.encode('ascii')
+    return buffer.getvalue()
+
+
+def write_entry(zf: zipfile.ZipFile, name: str, content: bytes):
+    info = zipfile.ZipInfo(name, ZIP_TIME)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.create_system = 3  # Unix, regardless of the platform building the jar
+    info.external_attr = 0o644 << 16
+    zf.writestr(info, content, compresslevel=COMPRESS_LEVEL)
@@ -1,7 +1,7 @@
 import json
 import os
 import re
-from typing import NamedTuple, Tuple, List, Mapping, Set, Any
+from typing import Iterator, NamedTuple, Tuple, List, Mapping, Set, Any, Dict, Sequence
 
 from mcresources import ResourceManager, utils
 from mcresources.type_definitions import JsonObject, ResourceLocation, ResourceIdentifier
@@ -15,6 +15,8 @@ EMPTY_LAST_PAGE = 'EMPTY_LAST_PAGE'
 
 NUM_TFC_CATEGORIES = 3
 
+LINK_PATTERN = re.compile(r'\$\(l:([^)]*)\)')
+
 class Component(NamedTuple):
     type: str
     x: int
@@ -54,16 +56,22 @@ class Page(NamedTuple):
         return self
 
     def translate(self, i18n: I18n):
+        self.data.update(self.translated_data(i18n))
+
+    def translated_data(self, i18n: I18n) -> JsonObject:
+        """ A copy of the data of this page, with all translation keys translated. Leaves the page unmodified, so it can be translated into multiple languages """
+        data = dict(self.data)
         for key in self.translation_keys:
-            if key in self.data and self.data[key] is not None:
-                value = self.data[key]
+            if key in data and data[key] is not None:
+                value = data[key]
                 if isinstance(value, SubstitutionStr):
                     try:
-                        self.data[key] = i18n.translate(value.value).format(*value.params)
+                        data[key] = i18n.translate(value.value).format(*value.params)
                     except IndexError as e:
                         raise ValueError('Error performing replacement for lang %s\n  \'%s\' -> \'%s\'' % (i18n.lang, value.value, i18n.translate(value.value))) from e
                 else:
-                    self.data[key] = i18n.translate(value)
+                    data[key] = i18n.translate(value)
+        return data
 
     def iter_all_text(self):
         for key in self.translation_keys:
@@ -89,6 +97,80 @@ class Category(NamedTuple):
     entries: Tuple[Entry, ...]
 
 
+class CompiledEntry(NamedTuple):
+    entry: Entry
+    pages: Tuple[Page, ...]  # The pages to write, excluding markers such as page_break()
+    extra_recipe_mappings: Dict[str, int] | None
+
+
+class CompiledCategory(NamedTuple):
+    category: Category
+    entries: Tuple[CompiledEntry, ...]
+
+
+class CompiledBook(NamedTuple):
+    """ The language independent structure of a book, which is validated once and can be built into any number of languages """
+    root_name: str
+    macros: JsonObject
+    categories: Tuple[CompiledCategory, ...]
+    link_targets: Dict[str, Set[str]]
+
+
+class LinkIndex:
+    """
+    All link targets (category/entry) in a book, and the anchors within each.
+    Validates every $(l:...) link, and that anchors and item links are unique within each entry, in a single pass over all pages, reporting all errors together.
+    """
+
+    def __init__(self, categories: Sequence[Category]):
+        self.categories = categories
+        self.targets: Dict[str, Set[str]] = {}
+        for c in categories:
+            for e in c.entries:
+                self.targets['%s/%s' % (c.category_id, e.entry_id)] = {p.anchor_id for p in e.pages if p.anchor_id is not None}
+
+    def errors(self) -> List[str]:
+        errors = []
+        for c in self.categories:
+            for e in c.entries:
+                errors += self.entry_errors(e)
+        return errors
+
+    def entry_errors(self, e: Entry) -> List[str]:
+        errors = []
+        seen_anchors = set()
+        seen_links = set()
+        for p in e.pages:
+            if p.anchor_id:
+                if p.anchor_id in seen_anchors:
+                    errors.append('Duplicate anchor "%s" on page %s' % (p.anchor_id, p))
+                seen_anchors.add(p.anchor_id)
+            for link in p.link_ids:
+                if link in seen_links:
+                    errors.append('Duplicate link "%s" on page %s' % (link, p))
+                seen_links.add(link)
+
+            # Validate all internal links of the form $(l:...)
+            for page_text in p.iter_all_text():
+                for match in LINK_PATTERN.finditer(page_text):
+                    key = match.group(1)
+                    if key.startswith('http'):
+                        continue  # Don't validate external links
+                    if '#' in key:
+                        target, anchor = key.split('#')
+                    else:
+                        target, anchor = key, None
+                    if target not in self.targets:
+                        errors.append('Link target \'%s\' not found for link \'%s\'\n  at page: %s\n  at entry: \'%s\'' % (target, key, p, e.entry_id))
+                    elif anchor is not None and anchor not in self.targets[target]:
+                        errors.append('Link anchor \'%s\' not found for link \'%s\'\n  at page: %s\n  at entry: \'%s\'' % (anchor, key, p, e.entry_id))
+        return errors
+
+    def validate(self):
+        errors = self.errors()
+        assert not errors, 'Found %d invalid links or anchors:\n%s' % (len(errors), '\n'.join(errors))
+
+
 class Book:
 
     def __init__(self, rm: ResourceManager, root_name: str, macros: JsonObject, i18n: I18n, local_instance: bool, reverse_translate: bool):
@@ -123,49 +205,18 @@ class Book:
         """
         self.categories.append(Category(category_id, name, description, icon, parent, is_sorted, entries))
 
-    def build(self):
-        # Only generate the book.json if we're in the root language
-        if self.i18n.lang == 'en_us':
-            self.rm.data(('patchouli_books', self.root_name, 'book'), {
-                'extend': 'tfc:field_guide',
-                'name': 'orehints field_guide extension',
-                'landing_text': 'orehints field_guide extension',
-                'subtitle': '${version}',
-                # Even though we don't use the book item, we still need patchy to make a book item for us, as it controls the title
-                # If neither we nor patchy make a book item, this will show up as 'Air'. So we make one to allow the title to work properly.
-                'dont_generate_book': False,
-                'show_progress': False,
-                'macros': self.macros
-            })
-
-        # Find all valid link targets
-        link_targets = {}
-        for c in self.categories:
-            for e in c.entries:
-                link_targets['%s/%s' % (c.category_id, e.entry_id)] = {p.anchor_id for p in e.pages if p.anchor_id is not None}
-
-        for c in self.categories:
-            self.build_category(link_targets, c.category_id, c.name, c.description, c.icon, c.parent, c.is_sorted, c.entries)
-
-    def build_category(self, link_targets: Mapping[str, Set[str]], category_id: str, name: str, description: str, icon: str, parent: str | None, is_sorted: bool, entries: Tuple[Entry, ...]):
-        if self.reverse_translate:
-            data = self.load_data(('patchouli_books', self.root_name, self.i18n.lang, 'categories', category_id))
-            self.i18n.after[name] = data['name']
-            self.i18n.after[description] = data['description']
-        else:
-            self.rm.data(('patchouli_books', self.root_name, self.i18n.lang, 'categories', category_id), {
-                'name': self.i18n.translate(name),
-                'description': self.i18n.translate(description),
-                'icon': icon,
-                'parent': parent,
-                'sortnum': self.category_count
-            })
-        self.category_count += 1
+    def compile(self) -> CompiledBook:
+        """ Validates the structure of the book, and resolves the pages of each entry. This does not depend on the language """
+        # Find all valid link targets, and validate every link against them
+        link_index = LinkIndex(self.categories)
+        link_index.validate()
 
-        category_res: ResourceLocation = utils.resource_location(self.rm.domain, category_id)
+        return CompiledBook(self.root_name, self.macros, tuple(CompiledCategory(c, self.compile_entries(c.entries)) for c in self.categories), link_index.targets)
 
+    def compile_entries(self, entries: Tuple[Entry, ...]) -> Tuple[CompiledEntry, ...]:
         assert not isinstance(entries, Entry), 'One entry in singleton entries, did you forget a comma after entry(), ?\n  at: %s' % str(entries)
-        for i, e in enumerate(entries):
+        compiled = []
+        for e in entries:
             assert not isinstance(e.pages, Page), 'One entry in singleton pages, did you forget a comma after page(), ?\n  at: %s' % str(e.pages)
             assert len(e.pages) > 0, 'Entry must have at least one page!\n  at: %s' % str(e.name)
 
@@ -196,32 +247,64 @@ class Book:
             if not extra_recipe_mappings:  # Exclude if there's nothing here
                 extra_recipe_mappings = None
 
-            # Validate no duplicate anchors or links
-            seen_anchors = set()
-            seen_links = set()
-            for p in real_pages:
-                if p.anchor_id:
-                    assert p.anchor_id not in seen_anchors, 'Duplicate anchor "%s" on page %s' % (p.anchor_id, p)
-                    seen_anchors.add(p.anchor_id)
-                for link in p.link_ids:
-                    assert link not in seen_links, 'Duplicate link "%s" on page %s' % (link, p)
-                    seen_links.add(link)
+            compiled.append(CompiledEntry(e, tuple(real_pages), extra_recipe_mappings))
+        return tuple(compiled)
 
-            # Validate all internal links of the form $(l:...)
-            for p in real_pages:
-                for page_text in p.iter_all_text():
-                    for match in re.finditer(r'\$\(l:([^)]*)\)', page_text):
-                        key = match.group(1)
-                        if key.startswith('http'):
-                            continue  # Don't validate external links
-                        if '#' in key:
-                            target, anchor = key.split('#')
-                        else:
-                            target, anchor = key, None
-                        assert target in link_targets, 'Link target \'%s\' not found for link \'%s\'\n  at page: %s\n  at entry: \'%s\'' % (target, key, p, e.entry_id)
-                        if anchor is not None:
-                            assert anchor in link_targets[target], 'Link anchor \'%s\' not found for link \'%s\'\n  at page: %s\n  at entry: \'%s\'' % (anchor, key, p, e.entry_id)
+    def build(self, compiled: CompiledBook | None = None):
+        """ Builds the book in the language of this book's i18n. If a compiled book is passed, it is used instead of the categories of this book """
+        for name_parts, data in self.data_files(compiled):
+            self.rm.data(name_parts, data)
+
+    def records(self, compiled: CompiledBook | None = None) -> Iterator['stream.Record']:
+        """ Yields every file of the book as (path, json), in the same order as build() writes them, without writing anything """
+        from stream import resource_json
+        for name_parts, data in self.data_files(compiled):
+            res = utils.resource_location(self.rm.domain, name_parts)
+            yield 'data/%s/%s.json' % (res.domain, res.path), resource_json(data)
+
+    def data_files(self, compiled: CompiledBook | None = None) -> Iterator[Tuple[ResourceIdentifier, JsonObject]]:
+        """ Yields the name and content of each data file of the book, category by category """
+        from profiling import phase
+        if compiled is None:
+            compiled = self.compile()
+
+        # Only generate the book.json if we're in the root language
+        if self.i18n.lang == 'en_us':
+            yield ('patchouli_books', self.root_name, 'book'), {
+                'extend': 'tfc:field_guide',
+                'name': 'orehints field_guide extension',
+                'landing_text': 'orehints field_guide extension',
+                'subtitle': '${version}',
+                # Even though we don't use the book item, we still need patchy to make a book item for us, as it controls the title
+                # If neither we nor patchy make a book item, this will show up as 'Air'. So we make one to allow the title to work properly.
+                'dont_generate_book': False,
+                'show_progress': False,
+                'macros': compiled.macros
+            }
+
+        for c in compiled.categories:
+            with phase('category %s' % c.category.category_id):
+                yield from self.category_files(c)
+
+    def category_files(self, compiled: CompiledCategory) -> Iterator[Tuple[ResourceIdentifier, JsonObject]]:
+        category_id, name, description, icon, parent, is_sorted, _ = compiled.category
+        if self.reverse_translate:
+            data = self.load_data(('patchouli_books', self.root_name, self.i18n.lang, 'categories', category_id))
+            self.i18n.after[name] = data['name']
+            self.i18n.after[description] = data['description']
+        else:
+            yield ('patchouli_books', self.root_name, self.i18n.lang, 'categories', category_id), {
+                'name': self.i18n.translate(name),
+                'description': self.i18n.translate(description),
+                'icon': icon,
+                'parent': parent,
+                'sortnum': self.category_count
+            }
+        self.category_count += 1
+
+        category_res: ResourceLocation = utils.resource_location(self.rm.domain, category_id)
 
+        for i, (e, real_pages, extra_recipe_mappings) in enumerate(compiled.entries):
             # Separately translate each page
             if self.reverse_translate:
                 rev_entry = self.load_data(('patchouli_books', self.root_name, self.i18n.lang, 'entries', category_res.path, e.entry_id))
@@ -238,23 +321,22 @@ class Book:
                 continue
 
             entry_name = self.i18n.translate(e.name)
-            for p in real_pages:
-                p.translate(self.i18n)
+            pages_data = [p.translated_data(self.i18n) for p in real_pages]
 
-            self.rm.data(('patchouli_books', self.root_name, self.i18n.lang, 'entries', category_res.path, e.entry_id), {
+            yield ('patchouli_books', self.root_name, self.i18n.lang, 'entries', category_res.path, e.entry_id), {
                 'name': entry_name,
                 'category': self.prefix(category_res.path),
                 'icon': e.icon,
                 'pages': [{
                     'type': self.prefix(p.type) if p.custom else p.type,
                     'anchor': p.anchor_id,
-                    **p.data
-                } for p in real_pages],
+                    **data
+                } for p, data in zip(real_pages, pages_data)],
                 'advancement': e.advancement,
                 'read_by_default': True,
                 'sortnum': i if is_sorted else None,
                 'extra_recipe_mappings': extra_recipe_mappings
-            })
+            }
 
     def prefix(self, path: str) -> str:
         """ In a local instance, domains are all under patchouli, otherwise under tfc """
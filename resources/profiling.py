@@ -0,0 +1,125 @@
+# Per-phase wall time and memory profiling of the generators, enabled with --profile
+# Generators mark their phases with `with phase(name):`, which does nothing unless a profiler is running.
+
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+
+class Profiler:
+    """
+    Records the wall time and the peak traced memory of nested phases, and the files written to each output directory.
+    Each phase is recorded with the names of the phases enclosing it, i.e. ['worldgen', './src', 'flush'].
+    """
+
+    def __init__(self, cprofile_path: Optional[str] = None):
+        self.cprofile_path = cprofile_path
+        self.cprofile = None
+        self.phases: List[Dict[str, Any]] = []
+        self.stack: List[List[Any]] = []  # [name, peak traced memory of the phase so far]
+        self.outputs: Dict[str, Set[str]] = {}
+        self.start_time = 0.0
+        self.start_ns = 0
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.start_ns = time.time_ns()
+        tracemalloc.start()
+        if self.cprofile_path is not None:
+            import cProfile
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def stop(self):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.cprofile_path)
+        tracemalloc.stop()
+
+    @contextmanager
+    def phase(self, name: str):
+        if self.stack:
+            self.stack[-1][1] = max(self.stack[-1][1], tracemalloc.get_traced_memory()[1])  # The peak is reset for this phase, so keep the parent's
+        tracemalloc.reset_peak()
+        self.stack.append([name, 0])
+        path = [n for n, _ in self.stack]
+        memory = tracemalloc.get_traced_memory()[0]
+        index = len(self.phases)
+        self.phases.append({})  # Phases are reported in the order they start
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            _, peak = self.stack.pop()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            self.phases[index] = {'path': path, 'seconds': seconds, 'peak_memory': peak, 'peak_growth': peak - memory}
+            if self.stack:
+                self.stack[-1][1] = max(self.stack[-1][1], peak)
+
+    def written(self, output_dir: str, paths: Iterable[str]):
+        self.outputs.setdefault(os.path.normpath(output_dir), set()).update(paths)
+
+    def report(self) -> Dict[str, Any]:
+        outputs = {}
+        for output_dir, paths in sorted(self.outputs.items()):
+            stats = [os.stat(p) for p in paths if os.path.isfile(p)]
+            outputs[output_dir] = {
+                'files': len(stats),
+                'bytes': sum(s.st_size for s in stats),
+                'bytes_written': sum(s.st_size for s in stats if s.st_mtime_ns >= self.start_ns),  # Files that were new or modified
+            }
+        return {
+            'seconds': time.perf_counter() - self.start_time,
+            'phases': self.phases,
+            'outputs': outputs,
+            'cprofile': self.cprofile_path,
+        }
+
+    def save(self, path: str):
+        report = self.report()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+        print('%-50s %10s %12s %12s' % ('Phase', 'Time ms', 'Peak KiB', 'Growth KiB'))
+        for p in report['phases']:
+            print('%-50s %10.1f %12.1f %12.1f' % ('  ' * (len(p['path']) - 1) + p['path'][-1], 1000 * p['seconds'], p['peak_memory'] / 1024, p['peak_growth'] / 1024))
+        print('%-40s %8s %12s %14s' % ('Output', 'Files', 'Bytes', 'Bytes Written'))
+        for output_dir, o in report['outputs'].items():
+            print('%-40s %8d %12d %14d' % (output_dir, o['files'], o['bytes'], o['bytes_written']))
+        print('Wrote profile to %s%s' % (path, '' if self.cprofile_path is None else ', and cProfile stats to %s' % self.cprofile_path))
+
+
+PROFILER: Optional[Profiler] = None
+
+
+def start(cprofile_path: Optional[str] = None):
+    global PROFILER
+    PROFILER = Profiler(cprofile_path)
+    PROFILER.start()
+
+
+def stop(path: str):
+    global PROFILER
+    PROFILER.stop()
+    PROFILER.save(path)
+    PROFILER = None
+
+
+@contextmanager
+def phase(name: str):
+    """ Marks a phase of a generator, which is timed if a profiler is running """
+    if PROFILER is None:
+        yield
+    else:
+        with PROFILER.phase(name):
+            yield
+
+
+def written(output_dir: str, paths: Iterable[str]):
+    """ Records files generated into an output directory, if a profiler is running """
+    if PROFILER is not None:
+        PROFILER.written(output_dir, paths)
@@ -0,0 +1,139 @@
+# Monte Carlo simulation of vein spawning over a synthetic chunk grid
+# Used to judge how generous a vein preset is, without booting a server.
+#
+# The vein shapes are approximations of TFC's vein features:
+# - Every chunk rolls each vein once, spawning with chance 1 / rarity, centered at a uniform y in [min_y, max_y]
+# - cluster: 2 - 5 spheres. The first has radius^2 = (0.6 - 1.1) * size^2 at the center, the rest (0.3 - 0.8) * size^2, offset by up to +/- size
+# - disc: a cylinder of radius = size, and the configured height
+# - pipe: a vertical cylinder of radius PIPE_RADIUS, and height = size. Skew and slant only move blocks sideways
+# - Each block within the shape is ore with chance = density, and only if the vein sits in a rock it replaces. Blocks where clusters overlap are counted once: the volume of the spheres is scaled by clusters.cluster_union(), the share of it within their union
+# - Blocks outside the world height are discarded
+
+import csv
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from clusters import MAX_CLUSTERS, cluster_union
+from constants import ROCKS, Rock
+from vein_table import CompiledVein, VeinTable
+import vein_table
+
+WORLD_MIN_Y = -64
+WORLD_MAX_Y = 320
+PIPE_RADIUS = 3
+BATCH_SIZE = 1 << 14  # Spawned veins per array op. Arrays are (batch, clusters, bands)
+
+
+class SimulationResult(NamedTuple):
+    veins: Tuple[CompiledVein, ...]
+    band_edges: np.ndarray  # (bands + 1,) y levels of the band boundaries
+    spawns: np.ndarray  # (veins,) number of chunks the vein spawned in
+    blocks: np.ndarray  # (veins, bands) expected ore blocks per chunk in each band
+
+    def ores(self) -> Dict[str, np.ndarray]:
+        """ Expected ore blocks per chunk per band, summed over all veins of each ore """
+        by_ore: Dict[str, np.ndarray] = {}
+        for v, row in zip(self.veins, self.blocks):
+            by_ore[v.vein.ore] = by_ore.get(v.vein.ore, 0) + row
+        return by_ore
+
+
+def simulate(veins: Sequence[CompiledVein], chunks: int, band_height: int = 16, samples: int = 1 << 14, seed: int = 0, rock_weights: Optional[Dict[str, float]] = None, rocks: Optional[Dict[str, Rock]] = None) -> SimulationResult:
+    """
+    Simulates spawning every vein over a square grid of chunks x chunks.
+    The number of chunks each vein spawns in is drawn exactly, as a binomial over every chunk roll. At most `samples` spawned veins are then rasterized, and the result is scaled up to the full count.
+    :param rock_weights: The relative abundance of each rock. A vein only produces ore if it lands in one of its rocks. Defaults to all rocks being equally common.
+    :param rocks: The rocks the veins were compiled against. Defaults to the rocks in constants.py
+    """
+    rng = np.random.default_rng(seed)
+    total_chunks = chunks * chunks
+
+    rock_names = tuple((ROCKS if rocks is None else rocks).keys())
+    weights = np.array([1.0 if rock_weights is None else rock_weights.get(r, 0) for r in rock_names])
+    weights /= weights.sum()
+
+    band_edges = np.arange(WORLD_MIN_Y, WORLD_MAX_Y + band_height, band_height, dtype=np.float64)
+    band_edges[-1] = min(band_edges[-1], WORLD_MAX_Y)
+
+    spawns = np.zeros(len(veins), dtype=np.int64)
+    blocks = np.zeros((len(veins), len(band_edges) - 1), dtype=np.float64)
+    for i, v in enumerate(veins):
+        spawns[i] = rng.binomial(total_chunks, 1 / v.vein.rarity)
+        n = int(min(spawns[i], samples))
+        if n == 0:
+            continue
+
+        matches = np.isin(np.arange(len(rock_names)), [rock_names.index(r) for r in v.rocks])
+        total = np.zeros(len(band_edges) - 1, dtype=np.float64)
+        for start in range(0, n, BATCH_SIZE):
+            size = min(BATCH_SIZE, n - start)
+            in_rock = matches[rng.choice(len(rock_names), size=size, p=weights)]
+            total += (vein_band_volumes(v, rng, size, band_edges) * in_rock[:, None]).sum(axis=0)
+
+        blocks[i] = total * (v.vein.density * 0.01) * (spawns[i] / n) / total_chunks
+
+    return SimulationResult(tuple(veins), band_edges, spawns, blocks)
+
+
+def vein_band_volumes(v: CompiledVein, rng: np.random.Generator, n: int, band_edges: np.ndarray) -> np.ndarray:
+    """ Samples n veins, returning the volume of each vein's shape within each band, as an (n, bands) array """
+    vein = v.vein
+    y = rng.integers(vein.min_y, vein.max_y, size=n, endpoint=True).astype(np.float64)
+    if vein.type == 'cluster':
+        clusters = rng.integers(2, MAX_CLUSTERS, size=n, endpoint=True)
+        scale = np.where(np.arange(MAX_CLUSTERS) == 0, 0.6, 0.3) + 0.5 * rng.random((n, MAX_CLUSTERS))
+        radius = np.sqrt(scale) * vein.size
+        radius[np.arange(MAX_CLUSTERS)[None, :] >= clusters[:, None]] = 0  # unused clusters
+        offset = rng.integers(0, vein.size, size=(n, MAX_CLUSTERS)) - rng.integers(0, vein.size, size=(n, MAX_CLUSTERS))
+        offset[:, 0] = 0
+        return sphere_band_volumes(y[:, None] + offset, radius, band_edges).sum(axis=1) * cluster_union(vein.size)
+    elif vein.type == 'disc':
+        return cylinder_band_volumes(y, vein.height, np.pi * vein.size ** 2, band_edges)
+    elif vein.type == 'pipe':
+        return cylinder_band_volumes(y, vein.size, np.pi * PIPE_RADIUS ** 2, band_edges)
+    raise ValueError('Unknown vein type: %s at %s' % (vein.type, v.name))
+
+
+def sphere_band_volumes(center: np.ndarray, radius: np.ndarray, band_edges: np.ndarray) -> np.ndarray:
+    """ The volume of spheres between each pair of band edges, in closed form. Returns an array of shape (*center.shape, bands) """
+    r = radius[..., None]
+    t = np.clip(band_edges - center[..., None], -r, r)
+    below = r * r * t - t * t * t / 3  # Volume below each edge / pi, up to a constant
+    return np.pi * np.diff(below, axis=-1)
+
+
+def cylinder_band_volumes(center: np.ndarray, height: float, area: float, band_edges: np.ndarray) -> np.ndarray:
+    """ The volume of vertical cylinders centered at each y between each pair of band edges. Returns an array of shape (*center.shape, bands) """
+    lo = np.maximum(band_edges[:-1], center[..., None] - height / 2)
+    hi = np.minimum(band_edges[1:], center[..., None] + height / 2)
+    return area * np.maximum(hi - lo, 0)
+
+
+def main(chunks: int, band_height: int, samples: int, seed: int, output: Optional[str]):
+    table: VeinTable = vein_table.table()
+    result = simulate(table.veins, chunks, band_height, samples, seed, rocks=table.rocks)
+
+    print('Simulated %d x %d chunks, %d block bands from y = %d to %d' % (chunks, chunks, band_height, WORLD_MIN_Y, WORLD_MAX_Y))
+    print('%-28s %-16s %10s %12s   %s' % ('Vein', 'Ore', 'Spawns', 'Ore / Chunk', 'Bands (90% of ore)'))
+    for v, spawned, row in zip(result.veins, result.spawns, result.blocks):
+        print('%-28s %-16s %10d %12.2f   %s' % (v.name, v.vein.ore, spawned, row.sum(), band_range(result.band_edges, row)))
+
+    if output is not None:
+        with open(output, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['vein', 'ore', 'family', 'spawns', *('y%d' % y for y in result.band_edges[:-1])])
+            for v, spawned, row in zip(result.veins, result.spawns, result.blocks):
+                writer.writerow([v.name, v.vein.ore, v.family, spawned, *('%.4f' % b for b in row)])
+        print('Wrote expected ore blocks per chunk per band to %s' % output)
+
+
+def band_range(band_edges: np.ndarray, row: np.ndarray) -> str:
+    """ The smallest range of bands, trimmed from both ends, which contains 90% of the ore """
+    total = row.sum()
+    if total <= 0:
+        return '-'
+    cumulative = np.cumsum(row) / total
+    lo = int(np.searchsorted(cumulative, 0.05))
+    hi = int(np.searchsorted(cumulative, 0.95))
+    return 'y = %d to %d' % (band_edges[lo], band_edges[min(hi + 1, len(band_edges) - 1)])
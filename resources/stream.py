@@ -0,0 +1,33 @@
+# Streams of generated files, as (path, json) records, in a deterministic order
+# world_gen.records() and Book.records() yield every file lazily, so a consumer (a resource manager, a zip, a hash) never needs the whole tree at once.
+
+from typing import Iterator, List, Sequence, Tuple
+
+from mcresources import ResourceManager
+from mcresources.type_definitions import Json, JsonObject
+
+import fragments
+
+Record = Tuple[str, JsonObject]  # The path of the file within the resource dir, i.e. 'data/tfc/worldgen/configured_feature/vein/sulfur.json', and its content
+COMMENT = 'This file was automatically created by mcresources'
+
+
+def resource_json(data: JsonObject) -> JsonObject:
+    """ The content of a file, as a resource manager writes it: with the comment, and without None values """
+    return fragments.del_none({'__comment__': COMMENT, **data})
+
+
+class RecordingResourceManager(ResourceManager):
+    """ A resource manager which collects writes as records, until they are drained, for generators which are written against a resource manager """
+
+    def __init__(self, domain: str):
+        super().__init__(domain, resource_dir='.')
+        self.records: List[Record] = []
+
+    def write(self, path_parts: Sequence[str], data: Json):
+        self.records.append(('/'.join(path_parts) + '.json', resource_json(data)))
+
+    def drain(self) -> Iterator[Record]:
+        records, self.records = self.records, []
+        return iter(records)
+
@@ -0,0 +1,259 @@
+# Searches the numbers of a vein preset for the ones which hit target yields of each ore, in each y band
+# Requires numpy. Targets are declared in a toml or json file, passed with --targets:
+#
+#   preset = "HIGH_METAL_ORE"               # The preset to tune, one of constants.PRESETS, or of the --veins file. Every vein using it is tuned together
+#
+#   [[targets]]
+#   ore = "hematite"                        # An ore, as in the vein definitions
+#   min_y = 120                             # The y band the yield is summed over, inclusive
+#   max_y = 210
+#   units = 8000                            # Expected units per chunk in the band, averaged over rocks: mB of metal for graded ores, blocks otherwise
+#
+# Yields are the closed form expectations of availability.py. The min_y and max_y of the preset are kept, and every combination of rarity, size, density and grade
+# weights on the grid below is evaluated. With its rarity and density, a preset's yield in every band is fixed (from veins using other presets) + density / rarity * (a function of size and grades),
+# so each size is evaluated as one array op over every grade, rarity and density, and sizes are spread over a process pool.
+#
+# Candidates are scored by their error, the root mean square of log(yield / target) over every target, and by their change from the current preset, the mean of
+# |log(new / old)| of rarity, size and density, and of the change in grade weights / 200. The result is the Pareto front of the two, and the proposed preset is
+# the smallest change within TOLERANCE of the targets, or within SLACK of the most accurate candidate if none are.
+
+import csv
+import json
+import tomllib
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from constants import ORES
+from vein_table import VeinTable
+import availability
+import vein_table
+
+RARITIES = np.arange(5, 201, 5)
+SIZES = tuple(range(5, 41))
+DENSITIES = np.arange(10, 101, 5)
+GRADE_STEP = 5  # Grade weights are every (poor, normal, rich) summing to 100, in steps of this
+TOLERANCE = 0.05  # An error at which the targets are met
+SLACK = 0.01  # When no candidate meets the targets, the error above the most accurate candidate which is as good
+UNITS = np.array([availability.GRADE_UNITS[g] for g in ('poor', 'normal', 'rich')], dtype=np.float64)
+
+
+class Target(NamedTuple):
+    ore: str
+    min_y: int
+    max_y: int
+    units: float
+
+
+class Problem(NamedTuple):
+    """ Everything a worker needs to evaluate candidates, independent of the table """
+    preset: Tuple[int, int, int, int, int, int, int, int]
+    veins: Tuple[Tuple[str, int], ...]  # (type, height) of each tuned vein
+    targets: Tuple[Target, ...]
+    fixed: np.ndarray  # (targets,) units per chunk from veins which don't use the preset
+    fixed_weight: np.ndarray  # (veins, rocks, targets) weight of the ungraded blocks of each target ore, times their units, in each rock of each vein
+    other_weight: np.ndarray  # (veins, rocks) weight of every ungraded block, in each rock of each vein
+    graded: np.ndarray  # (veins, targets) if a vein places graded blocks of a target ore
+    has_grades: np.ndarray  # (veins,) if a vein places graded blocks of any ore, whose weights are tuned
+    rocks: int  # Rocks in the table, which yields are averaged over
+
+
+class Front(NamedTuple):
+    presets: np.ndarray  # (candidates, 8) as in constants.PRESETS
+    error: np.ndarray  # (candidates,)
+    change: np.ndarray  # (candidates,)
+    yields: np.ndarray  # (candidates, targets) units per chunk
+
+
+def load(path: str) -> Tuple[str, Tuple[Target, ...]]:
+    """ Loads and validates a toml or json target file, reporting every error together """
+    with open(path, 'rb') as f:
+        document = tomllib.load(f) if path.endswith('.toml') else json.load(f)
+
+    errors: List[str] = []
+    preset = document.get('preset')
+    presets = vein_table.presets()
+    if preset not in presets:
+        errors.append('preset must be one of %s, got %s' % (', '.join(presets), preset))
+    targets = []
+    for i, fields in enumerate(document.get('targets', ())):
+        target_errors = []
+        unknown = set(fields) - set(Target._fields)
+        if unknown:
+            target_errors.append('Unknown fields %s' % ', '.join(sorted(unknown)))
+        for key, field_type in (('ore', str), ('min_y', int), ('max_y', int), ('units', (int, float))):
+            if key not in fields:
+                target_errors.append('Missing %s' % key)
+            elif not isinstance(fields[key], field_type) or isinstance(fields[key], bool):
+                target_errors.append('%s must be a %s' % (key, 'number' if key == 'units' else field_type.__name__))
+        if isinstance(fields.get('ore'), str) and fields['ore'] not in ORES:
+            target_errors.append('Unknown ore %s' % fields['ore'])
+        if isinstance(fields.get('units'), (int, float)) and fields['units'] <= 0:
+            target_errors.append('units must be positive')
+        if isinstance(fields.get('min_y'), int) and isinstance(fields.get('max_y'), int) and fields['min_y'] > fields['max_y']:
+            target_errors.append('min_y must be at most max_y')
+        if target_errors:
+            errors += ['targets[%d]: %s' % (i, e) for e in target_errors]
+        else:
+            targets.append(Target(fields['ore'], fields['min_y'], fields['max_y'], float(fields['units'])))
+    if not targets and not errors:
+        errors.append('No targets declared')
+    if errors:
+        raise RuntimeError('Found %d errors in tuning targets at %s:\n%s' % (len(errors), path, '\n'.join(errors)))
+    return preset, tuple(targets)
+
+
+def problem(table: VeinTable, name: str, preset: Tuple[int, ...], targets: Sequence[Target]) -> Problem:
+    """ Splits the yield of every target into the fixed part from other veins, and the weights of the blocks of each vein using the preset, by name as in variants.override() """
+    tuned = [v for v in table.veins if v.vein.preset == name]
+    if not tuned:
+        raise RuntimeError('No veins use the preset %s' % name)
+
+    result = availability.availability(table)
+    others = np.array([v.vein.preset != name for v in table.veins])
+    other_units = np.einsum('vyr,vrp->pyr', result.blocks[others], result.split[others]) * result.units[:, None, None]
+    fixed = np.zeros(len(targets))
+    for t, target in enumerate(targets):
+        in_band = (result.levels >= target.min_y) & (result.levels <= target.max_y)
+        for p, product in enumerate(result.products):
+            if availability.product_ore(product)[1] == target.ore:
+                fixed[t] += other_units[p, in_band].sum() / len(result.rocks)
+
+    rocks = max(len(dict.fromkeys(v.rocks)) for v in tuned)
+    fixed_weight = np.zeros((len(tuned), rocks, len(targets)))
+    other_weight = np.zeros((len(tuned), rocks))
+    graded = np.zeros((len(tuned), len(targets)), dtype=bool)
+    has_grades = np.zeros(len(tuned), dtype=bool)
+    for i, v in enumerate(tuned):
+        entries = dict(zip(v.rocks, v.blocks))  # A rock may be listed both by name and by category
+        for r, entry in enumerate(entries.values()):
+            for option in entry['with']:
+                product = option['block'].rsplit('/', 1)[0]
+                grade, ore = availability.product_ore(product)
+                for t, target in enumerate(targets):
+                    if grade is not None and ore == target.ore:
+                        graded[i, t] = True
+                    elif ore == target.ore:
+                        fixed_weight[i, r, t] += option.get('weight', 1) * availability.product_units(product)
+                if grade is None:
+                    other_weight[i, r] += option.get('weight', 1)
+                else:
+                    has_grades[i] = True
+    for i, v in enumerate(tuned):
+        other_weight[i, len(dict.fromkeys(v.rocks)):] = np.inf  # Padding for veins with fewer rocks, which place nothing
+
+    return Problem(tuple(preset), tuple((v.vein.type, v.vein.height) for v in tuned), tuple(targets), fixed, fixed_weight, other_weight, graded, has_grades, len(result.rocks))
+
+
+def grades(p: Problem) -> np.ndarray:
+    """ (candidates, 3) every poor, normal and rich weight on the grid, or the preset's if it places no graded ore """
+    if not p.has_grades.any():
+        return np.array([p.preset[5:8]], dtype=np.float64)
+    steps = np.arange(0, 101, GRADE_STEP)
+    poor, normal = np.meshgrid(steps, steps, indexing='ij')
+    keep = poor + normal <= 100
+    return np.column_stack([poor[keep], normal[keep], 100 - poor[keep] - normal[keep]]).astype(np.float64)
+
+
+def per_spawn(p: Problem, size: int, weights: np.ndarray) -> np.ndarray:
+    """ (grades, targets) the yield of each target per unit of density / rarity, for each (poor, normal, rich) weights """
+    graded_units = weights @ UNITS
+    graded_total = weights.sum(axis=1)
+    result = np.zeros((len(weights), len(p.targets)))
+    for i, (vein_type, height) in enumerate(p.veins):
+        bands = np.array([availability.vein_profile(vein_type, size, height, p.preset[2], p.preset[3], t.min_y, t.max_y).sum() for t in p.targets])
+        ore_weight = p.fixed_weight[i][None, :, :] + p.graded[i][None, None, :] * graded_units[:, None, None]  # (grades, rocks, targets)
+        total_weight = p.other_weight[i][None, :] + (graded_total[:, None] if p.has_grades[i] else 0)  # (grades, rocks)
+        result += bands[None, :] * (ore_weight / total_weight[:, :, None]).sum(axis=1) / p.rocks
+    return result
+
+
+def evaluate(p: Problem, size: int) -> Front:
+    """ Evaluates every candidate of one size, returning its Pareto front """
+    preset = p.preset
+    weights = grades(p)
+    scale = (DENSITIES[None, :] * 0.01 / RARITIES[:, None]).ravel()  # (rarities * densities,)
+    yields = p.fixed[None, None, :] + scale[:, None, None] * per_spawn(p, size, weights)[None, :, :]  # (rarities * densities, grades, targets)
+    targets = np.array([t.units for t in p.targets])
+    error = np.sqrt(np.mean(np.log(np.maximum(yields, 1e-12) / targets) ** 2, axis=-1))
+
+    rarity, density = (a.ravel() for a in np.meshgrid(RARITIES, DENSITIES, indexing='ij'))
+    change = (np.abs(np.log(rarity / preset[0]))[:, None] + abs(np.log(size / preset[1])) + np.abs(np.log(density / preset[4]))[:, None]
+              + (np.abs(weights - np.array(preset[5:8])).sum(axis=1) / 200)[None, :]) / 4
+
+    keep = pareto(error.ravel(), change.ravel())  # Candidates are only built for the front
+    scaled, grade = np.divmod(keep, len(weights))
+    candidates = np.column_stack([rarity[scaled], np.full(keep.size, size), np.full(keep.size, preset[2]), np.full(keep.size, preset[3]), density[scaled], weights[grade]])
+    return Front(candidates, error.ravel()[keep], change.ravel()[keep], yields.reshape(error.size, -1)[keep])
+
+
+def pareto(error: np.ndarray, change: np.ndarray) -> np.ndarray:
+    """ The indices of the candidates which no other candidate beats on both error and change, most accurate first """
+    order = np.argsort(error)
+    order = order[improves(change[order])]  # A superset of the front, as ties in error may be in any order
+    order = order[np.lexsort((change[order], error[order]))]
+    return order[improves(change[order])]
+
+
+def improves(change: np.ndarray) -> np.ndarray:
+    """ If each change is below every change before it """
+    return change < np.concatenate([[np.inf], np.minimum.accumulate(change)[:-1]])
+
+
+def tune(p: Problem, jobs: Optional[int] = None) -> Front:
+    """ The Pareto front of error and change, over every candidate on the grid, most accurate first """
+    if jobs == 1:
+        fronts = [evaluate(p, size) for size in SIZES]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            fronts = list(pool.map(evaluate, [p] * len(SIZES), SIZES))
+    front = Front(*(np.concatenate(parts) for parts in zip(*fronts)))
+    keep = pareto(front.error, front.change)
+    return Front(front.presets[keep], front.error[keep], front.change[keep], front.yields[keep])
+
+
+def current(p: Problem) -> np.ndarray:
+    """ (targets,) the yields of the preset as it is """
+    return p.fixed + p.preset[4] * 0.01 / p.preset[0] * per_spawn(p, p.preset[1], np.array([p.preset[5:8]], dtype=np.float64))[0]
+
+
+def proposed(front: Front) -> int:
+    """ The index of the smallest change which meets the targets, or is within SLACK of the most accurate candidate """
+    within = np.nonzero(front.error <= max(TOLERANCE, front.error.min() + SLACK))[0]
+    return int(within[np.argmin(front.change[within])])
+
+
+def main(targets_file: Optional[str], jobs: Optional[int], output: Optional[str], limit: int = 25):
+    if targets_file is None:
+        raise RuntimeError('tune requires a target file, passed with --targets. See tune.py')
+    name, targets = load(targets_file)
+    preset = vein_table.presets()[name]
+    p = problem(vein_table.table(), name, preset, targets)
+    front = tune(p, jobs)
+    best = proposed(front)
+
+    print('Tuned %s = %s against %d targets, over %d candidates' % (name, preset_tuple(preset), len(targets), len(RARITIES) * len(SIZES) * len(DENSITIES) * len(grades(p))))
+    print('%-16s %-12s %12s %12s' % ('Ore', 'Y', 'Target', 'Current'))
+    for target, value in zip(targets, current(p)):
+        print('%-16s %-12s %12.1f %12.1f' % (target.ore, '%d..%d' % (target.min_y, target.max_y), target.units, value))
+
+    print('Pareto front of %d candidates, from the most accurate to the smallest change' % len(front.error))
+    print('%-44s %8s %8s   %s' % ('Preset', 'Error', 'Change', 'Yields'))
+    shown = np.unique(np.linspace(0, len(front.error) - 1, min(limit, len(front.error))).astype(int).tolist() + [best])
+    for i in shown:
+        print('%-44s %7.1f%% %8.3f   %s%s' % (preset_tuple(front.presets[i]), 100 * front.error[i], front.change[i], ', '.join('%.1f' % y for y in front.yields[i]), '  <- proposed' if i == best else ''))
+    print('Error = root mean square of log(yield / target). Change = mean log ratio of rarity, size and density to the current preset, and grade weight change / 200')
+    print('Proposed: %s = %s' % (name, preset_tuple(front.presets[best])))
+
+    if output is not None:
+        with open(output, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['rarity', 'size', 'min_y', 'max_y', 'density', 'poor', 'normal', 'rich', 'error', 'change'] + ['%s %d..%d' % (t.ore, t.min_y, t.max_y) for t in targets])
+            for i in range(len(front.error)):
+                writer.writerow([int(n) for n in front.presets[i]] + ['%.4f' % front.error[i], '%.4f' % front.change[i]] + ['%.2f' % y for y in front.yields[i]])
+        print('Wrote the Pareto front to %s' % output)
+
+
+def preset_tuple(numbers: np.ndarray) -> str:
+    return '(%s)' % ', '.join(str(int(n)) for n in numbers)
@@ -0,0 +1,76 @@
+# Validation that generated resources match the files on disk
+
+import difflib
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from mcresources import ResourceManager
+from mcresources.type_definitions import JsonObject
+
+import fragments
+
+
+class ValidatingResourceManager(ResourceManager):
+    """
+    Checks generated files against the existing files instead of writing them.
+    Writes are queued, and checked on flush(): first by comparing a hash of the expected serialization against a hash of the file on disk, over a pool of threads.
+    Only files whose hashes differ are parsed, compared, and diffed.
+    """
+
+    def __init__(self, domain: str, resource_dir, workers: Optional[int] = None):
+        super(ValidatingResourceManager, self).__init__(domain, resource_dir)
+        self.validation_error = False
+        self.workers = workers
+        self.pending: List[Tuple[str, JsonObject, bytes]] = []
+
+    def write(self, path_parts, data_to_write):
+        data_to_write = fragments.del_none({'__comment__': 'This file was automatically created by mcresources', **data_to_write})
+        path = os.path.join(self.resource_dir, *path_parts) + '.json'
+        text = fragments.dumps(data_to_write, self.indent, self.ensure_ascii)
+        self.pending.append((path, data_to_write, hashlib.sha1(text.encode('utf-8')).digest()))
+
+    def flush(self):
+        super(ValidatingResourceManager, self).flush()
+        self.validate()
+
+    def validate(self):
+        """ Checks all queued writes against the files on disk """
+        pending, self.pending = self.pending, []
+        with ThreadPoolExecutor(self.workers) as pool:
+            digests = list(pool.map(file_digest, (path for path, _, _ in pending)))
+
+        for (path, data_to_write, expected), digest in zip(pending, digests):
+            if digest == expected:
+                self.unchanged_files += 1
+                continue
+            try:
+                if digest is None:
+                    print('Error: resource generation created new file \'%s\'' % path, file=sys.stderr)
+                    self.error_files += 1
+                    continue
+                with open(path, 'r', encoding='utf-8') as file:
+                    old_data = json.load(file)
+                if old_data != data_to_write:
+                    old_text = json.dumps(old_data, indent=self.indent)
+                    text = json.dumps(data_to_write, indent=self.indent)
+                    diff = '\n'.join(difflib.unified_diff(old_text.split('\n'), text.split('\n'), 'old', 'new', n=1))
+                    print('Error: resource generation modified file \'%s\' Diff:\n%s\n' % (path, diff), file=sys.stderr)
+                    self.error_files += 1
+                else:
+                    self.unchanged_files += 1  # Only the formatting differs
+            except Exception as e:
+                self.on_error(path, e)
+                self.error_files += 1
+
+
+def file_digest(path: str) -> Optional[bytes]:
+    """ The hash of a file's contents, or None if it doesn't exist """
+    try:
+        with open(path, 'rb') as file:
+            return hashlib.sha1(file.read()).digest()
+    except FileNotFoundError:
+        return None
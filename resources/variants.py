@@ -0,0 +1,143 @@
+# Build variants: each is a mod, with its own domain, resource tree and jar, generated from the shared vein definitions
+# The builtin variants are the two released mods. Any number of variants can be declared in a file, passed with --variants:
+#
+#   [variants.orehints]
+#   domain = "tfcgyres_orehints"            # The domain of the book
+#   resource_dir = "./src"                  # Where generated files are written, and the static files of the jar are read from
+#   jar = "TFCGyres-OreHints-%s.jar"        # The jar file name, formatted with the version
+#   hints = true                            # If mineral veins have hint rocks
+#   surprise = true                         # Optional, if surprise veins are included. Default true
+#
+#   [variants.orehints.presets]             # Optional, replaces the numbers of every vein using a preset, by name (see constants.PRESETS, and presets in a --veins file)
+#   HIGH_METAL_ORE = [20, 15, 120, 210, 80, 10, 30, 60]
+#
+# Variants which only differ by domain, directory or hints share the same vein model, and unchanged veins are compiled once for all variants.
+
+import json
+import tomllib
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from constants import Vein
+from vein_table import VeinTable
+import vein_table
+
+
+class Variant(NamedTuple):
+    name: str
+    domain: str
+    resource_dir: str
+    jar: str
+    hints: bool
+    surprise: bool = True
+    presets: Tuple[Tuple[str, Tuple[int, int, int, int, int, int, int, int]], ...] = ()  # Sorted by name, so variants with the same overrides share a model
+
+    def is_builtin(self) -> bool:
+        """ If this variant generates the veins in the table, unchanged """
+        return self.surprise and not self.presets
+
+
+VARIANTS: Tuple[Variant, ...] = (
+    Variant('orehints', 'tfcgyres_orehints', './src', 'TFCGyres-OreHints-%s.jar', True),
+    Variant('veinbuffs', 'tfcgyres_veinbuffs', './src_veinbuffs', 'TFCGyres-VeinBuffs-%s.jar', False),
+)
+
+VARIANT_FIELDS = {'domain': str, 'resource_dir': str, 'jar': str, 'hints': bool, 'surprise': bool, 'presets': dict}  # The fields of a variant in a definition file, and their types. The name is its key
+OPTIONAL_FIELDS = {'surprise', 'presets'}
+
+VARIANTS_FILE: Optional[str] = None  # A variant definition file, set by --variants
+SELECTED: Optional[Sequence[str]] = None  # The names of the variants to build, set by --variant. Default all
+
+
+def variants() -> Tuple[Variant, ...]:
+    """ The variants to build, from VARIANTS_FILE if set """
+    declared = VARIANTS if VARIANTS_FILE is None else load(VARIANTS_FILE)
+    if SELECTED is None:
+        return declared
+    unknown = set(SELECTED) - {v.name for v in declared}
+    if unknown:
+        raise RuntimeError('Unknown variants: %s, expected one of %s' % (', '.join(sorted(unknown)), ', '.join(v.name for v in declared)))
+    return tuple(v for v in declared if v.name in SELECTED)
+
+
+def load(path: str) -> Tuple[Variant, ...]:
+    """ Loads and validates a toml or json variant definition file, reporting every error together """
+    with open(path, 'rb') as f:
+        document = tomllib.load(f) if path.endswith('.toml') else json.load(f)
+
+    errors: List[str] = []
+    result = []
+    known_presets = vein_table.presets()
+    declared = document.get('variants', {}) if isinstance(document, dict) else None
+    if not isinstance(declared, dict):
+        errors.append('variants must be a table of variants, by name')
+        declared = {}
+    for name, fields in declared.items():
+        if not isinstance(fields, dict):
+            errors.append('%s: must be a table of fields' % name)
+            continue
+        variant_errors = []
+        unknown = set(fields) - set(VARIANT_FIELDS)
+        if unknown:
+            variant_errors.append('Unknown fields %s' % ', '.join(sorted(unknown)))
+        for key, field_type in VARIANT_FIELDS.items():
+            if key in fields and not isinstance(fields[key], field_type):
+                variant_errors.append('%s must be %s' % (key, 'a table' if field_type is dict else 'of type %s' % field_type.__name__))
+            elif key not in fields and key not in OPTIONAL_FIELDS:
+                variant_errors.append('Missing %s' % key)
+        if isinstance(fields.get('jar'), str) and '%s' not in fields['jar']:
+            variant_errors.append('jar must contain a %s for the version')
+        presets = fields.get('presets', {})
+        for preset, numbers in presets.items() if isinstance(presets, dict) else ():
+            if preset not in known_presets:
+                variant_errors.append('Unknown preset %s, expected one of %s' % (preset, ', '.join(known_presets)))
+            elif not isinstance(numbers, list) or len(numbers) != 8 or not all(isinstance(n, int) and not isinstance(n, bool) for n in numbers):
+                variant_errors.append('Preset %s must be a list of 8 integers: rarity, size, min_y, max_y, density, poor, normal, rich' % preset)
+        if variant_errors:
+            errors += ['%s: %s' % (name, e) for e in variant_errors]
+        else:
+            result.append(Variant(name, fields['domain'], fields['resource_dir'], fields['jar'], fields['hints'], fields.get('surprise', True), tuple(sorted((p, tuple(n)) for p, n in presets.items()))))
+
+    for key in ('domain', 'resource_dir', 'jar'):
+        values = [getattr(v, key) for v in result]
+        duplicates = sorted({value for value in values if values.count(value) > 1})
+        if duplicates:
+            errors.append('Variants must not share a %s: %s' % (key, ', '.join(duplicates)))
+    if not result and not errors:
+        errors.append('No variants declared')
+    if errors:
+        raise RuntimeError('Found %d errors in variant definitions at %s:\n%s' % (len(errors), path, '\n'.join(errors)))
+    return tuple(result)
+
+
+def build_models(selected: Sequence[Variant], table: Optional[VeinTable] = None) -> Dict[str, 'world_gen.VeinModel']:
+    """ The vein model of each variant, by name. Each distinct set of veins is compiled and built once """
+    import world_gen
+
+    if table is None:
+        table = vein_table.table()
+    by_veins = {}
+    models = {}
+    for variant in selected:
+        key = variant.surprise, variant.presets
+        if key not in by_veins:
+            by_veins[key] = world_gen.build_model(variant_table(table, variant))
+        models[variant.name] = by_veins[key]
+    return models
+
+
+def variant_table(table: VeinTable, variant: Variant) -> VeinTable:
+    """ The veins of a variant, with presets replaced, and surprise veins removed if disabled """
+    if variant.is_builtin():
+        return table
+    overrides = dict(variant.presets)
+    families = tuple((family, {} if family == 'surprise' and not variant.surprise else {
+        v.name: override(v.vein, overrides) for v in compiled
+    }) for family, compiled in table.families.items())
+    return VeinTable(table.rocks, families, table.indicators, base=table)
+
+
+def override(vein: Vein, overrides: Dict[str, tuple]) -> Vein:
+    """ Replaces the numbers of a vein, if it uses one of the overridden presets, by name """
+    if vein.preset in overrides:
+        return Vein(*vein[:2], *overrides[vein.preset], *vein[10:])  # rarity, size, min_y, max_y, density, poor, normal, rich, as in preset_vein()
+    return vein
@@ -0,0 +1,269 @@
+# Loads vein definitions from a declarative file (toml, json or csv), in addition to, or instead of, the veins in constants.py
+#
+# toml and json files have the same structure:
+#
+#   include_builtin = true                  # Optional, if the rocks, presets, indicators and veins of constants.py are included. Default true
+#
+#   [presets]                               # Optional, named presets, in addition to constants.PRESETS
+#   SHALLOW_ORE = [60, 20, 0, 100, 60, 20, 50, 30]  # rarity, size, min_y, max_y, density, poor, normal, rich
+#
+#   [rocks]                                 # Optional, add-on rocks
+#   pumice = { category = "igneous_extrusive", sand = "black" }
+#
+#   [indicators]                            # Optional, the hint rock of each mineral ore
+#   sulfur = "pumice"
+#
+#   [veins.mineral.pumice_sulfur]           # veins.<family>.<name>, where family is one of vein_table.VEIN_FAMILIES
+#   ore = "sulfur"
+#   type = "cluster"
+#   rocks = ["pumice"]
+#   preset = "HIGH_MINERAL_ORE"             # Either a preset, or all of rarity, size, min_y, max_y, density, poor, normal, rich
+#   spoiler_ore = "gypsum"                  # The remaining fields are the optional arguments of preset_vein()
+#   spoiler_rarity = 20
+#   spoiler_rocks = ["pumice"]
+#
+# csv files hold one vein per row, with a 'family' and 'name' column, and a column for any of the vein fields above.
+# Lists are separated by spaces, and empty cells are left unset. Presets, rocks and indicators are the builtin ones.
+#
+# Files are validated in full, reporting every error together. The compiled veins are cached next to the file, keyed by a hash of its contents.
+
+import csv
+import hashlib
+import io
+import json
+import marshal
+import os
+import sys
+import tomllib
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from constants import *
+
+CACHE_VERSION = 2
+
+VEIN_TYPES = ('cluster', 'disc', 'pipe')
+PRESET_FIELDS = ('rarity', 'size', 'min_y', 'max_y', 'density', 'poor', 'normal', 'rich')
+OPTIONAL_FIELDS = {'spoiler_ore': None, 'spoiler_rarity': 0, 'spoiler_rocks': None, 'biomes': None, 'height': 2, 'deposits': False}  # The defaults of preset_vein()
+FIELD_TYPES = {
+    'ore': str, 'type': str, 'preset': str, 'rocks': list, 'spoiler_ore': str, 'spoiler_rocks': list, 'biomes': str, 'deposits': bool,
+    'rarity': int, 'size': int, 'min_y': int, 'max_y': int, 'density': int, 'spoiler_rarity': int, 'height': int,
+    'poor': float, 'normal': float, 'rich': float,
+}
+
+
+class VeinData(NamedTuple):
+    rocks: Dict[str, Rock]
+    families: Tuple[Tuple[str, Dict[str, Vein]], ...]
+    indicators: Dict[str, str]
+    presets: Dict[str, Tuple[int, int, int, int, int, int, int, int]]  # Including the builtin ones, if included
+
+
+def load(path: str) -> VeinData:
+    """ Loads, validates and compiles a vein definition file, or reads the compiled veins from the cache if the file is unchanged """
+    with open(path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha1(content + repr((CACHE_VERSION, ROCKS, PRESETS, MINERAL_INDICATORS)).encode('utf-8')).hexdigest()
+
+    compiled = read_cache(path, digest)
+    if compiled is None:
+        compiled = compile_document(parse(path, content), path)
+        write_cache(path, digest, compiled)
+    return assemble(*compiled)
+
+
+def parse(path: str, content: bytes) -> Dict[str, Any]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.toml':
+        return tomllib.loads(content.decode('utf-8'))
+    if ext == '.json':
+        return json.loads(content.decode('utf-8'))
+    if ext == '.csv':
+        return parse_csv(content.decode('utf-8'))
+    raise RuntimeError('Unknown vein definition format: %s, expected .toml, .json or .csv' % path)
+
+
+def parse_csv(text: str) -> Dict[str, Any]:
+    """ Converts csv rows into the same structure as a toml or json file """
+    veins: Dict[str, Dict[str, Any]] = {}
+    for row in csv.DictReader(io.StringIO(text)):
+        fields: Dict[str, Any] = {}
+        for key, value in row.items():
+            if key in ('family', 'name') or value is None or value.strip() == '':
+                continue
+            value = value.strip()
+            field_type = FIELD_TYPES.get(key)
+            if field_type is list:
+                fields[key] = value.split()
+            elif field_type is bool:
+                fields[key] = value.lower() in ('true', '1', 'yes')
+            elif field_type is int:
+                fields[key] = int(value) if value.lstrip('-').isdigit() else value  # Left as is, and reported by validation
+            elif field_type is float:
+                try:
+                    fields[key] = float(value)
+                except ValueError:
+                    fields[key] = value
+            else:
+                fields[key] = value
+        veins.setdefault(row.get('family') or '', {})[row.get('name') or ''] = fields
+    return {'veins': veins}
+
+
+def compile_document(document: Dict[str, Any], path: str) -> Tuple[bool, Dict[str, Tuple[str, str]], Dict[str, str], Dict[str, List[Tuple[str, tuple]]], Dict[str, tuple]]:
+    """ Validates a parsed file, and resolves presets. Returns plain tuples, lists and dicts, which can be cached with marshal """
+    from vein_table import VEIN_FAMILIES
+
+    errors: List[str] = []
+    unknown = set(document) - {'include_builtin', 'presets', 'rocks', 'indicators', 'veins'}
+    if unknown:
+        errors.append('Unknown sections: %s' % ', '.join(sorted(unknown)))
+
+    include_builtin = document.get('include_builtin', True)
+    if not isinstance(include_builtin, bool):
+        errors.append('include_builtin must be true or false')
+        include_builtin = True
+
+    presets = dict(PRESETS) if include_builtin else {}
+    for name, preset in document.get('presets', {}).items():
+        if not isinstance(preset, list) or len(preset) != len(PRESET_FIELDS) or not all(isinstance(p, (int, float)) and not isinstance(p, bool) for p in preset):
+            errors.append('Preset %s must be a list of %d numbers: %s' % (name, len(PRESET_FIELDS), ', '.join(PRESET_FIELDS)))
+        else:
+            presets[name] = tuple(preset)
+
+    rocks = {name: tuple(rock) for name, rock in ROCKS.items()} if include_builtin else {}
+    for name, rock in document.get('rocks', {}).items():
+        if not isinstance(rock, dict) or rock.get('category') not in ROCK_CATEGORIES or not isinstance(rock.get('sand'), str) or set(rock) != {'category', 'sand'}:
+            errors.append('Rock %s must have a category, one of %s, and a sand color' % (name, ', '.join(ROCK_CATEGORIES)))
+        else:
+            rocks[name] = (rock['category'], rock['sand'])
+
+    indicators = dict(MINERAL_INDICATORS) if include_builtin else {}
+    for ore, rock in document.get('indicators', {}).items():
+        if rock not in rocks:
+            errors.append('Indicator for %s is not a known rock: %s' % (ore, rock))
+        else:
+            indicators[ore] = rock
+
+    families = {family: [] for family, _ in VEIN_FAMILIES}
+    seen = {name for _, veins in VEIN_FAMILIES for name in veins} if include_builtin else set()
+    for family, veins in document.get('veins', {}).items():
+        if family not in families:
+            errors.append('Unknown vein family: %s, expected one of %s' % (family, ', '.join(families)))
+            continue
+        for name, fields in veins.items():
+            vein_errors = validate_vein(name, family, fields, presets, rocks, indicators)
+            if name in seen:
+                vein_errors.append('Duplicate vein name')
+            seen.add(name)
+            if vein_errors:
+                errors += ['%s.%s: %s' % (family, name, e) for e in vein_errors]
+            else:
+                families[family].append((name, vein_tuple(fields, presets)))
+
+    if errors:
+        raise RuntimeError('Found %d errors in vein definitions at %s:\n%s' % (len(errors), path, '\n'.join(errors)))
+    return include_builtin, rocks, indicators, families, presets
+
+
+def validate_vein(name: str, family: str, fields: Dict[str, Any], presets: Dict[str, tuple], rocks: Dict[str, Tuple[str, str]], indicators: Dict[str, str]) -> List[str]:
+    errors = []
+    if not name:
+        errors.append('Missing name')
+    for key, value in fields.items():
+        if key not in FIELD_TYPES:
+            errors.append('Unknown field %s' % key)
+        elif not is_type(value, FIELD_TYPES[key]):
+            errors.append('%s must be of type %s: %r' % (key, FIELD_TYPES[key].__name__, value))
+    if errors:
+        return errors
+
+    missing = [key for key in ('ore', 'type', 'rocks') if key not in fields]
+    if missing:
+        return ['Missing %s' % ', '.join(missing)]
+
+    if fields['type'] not in VEIN_TYPES:
+        errors.append('Unknown type %s, expected one of %s' % (fields['type'], ', '.join(VEIN_TYPES)))
+    if not fields['rocks']:
+        errors.append('rocks must not be empty')
+    for key in ('rocks', 'spoiler_rocks'):
+        for rock in fields.get(key) or ():
+            if rock not in rocks and rock not in ROCK_CATEGORIES:
+                errors.append('Unknown rock or rock category in %s: %s' % (key, rock))
+    if fields.get('spoiler_ore') is not None and not fields.get('spoiler_rocks'):
+        errors.append('spoiler_ore requires spoiler_rocks')
+    if not 0 <= fields.get('spoiler_rarity', 0) < 100:
+        errors.append('spoiler_rarity must be between 0 and 99')
+    if family == 'mineral' and fields['ore'] not in indicators:
+        errors.append('Mineral ore %s has no indicator rock' % fields['ore'])
+
+    if 'preset' in fields:
+        if fields['preset'] not in presets:
+            return errors + ['Unknown preset %s' % fields['preset']]
+        if any(key in fields for key in PRESET_FIELDS):
+            return errors + ['Both a preset, and %s' % ', '.join(key for key in PRESET_FIELDS if key in fields)]
+    elif any(key not in fields for key in PRESET_FIELDS):
+        return errors + ['Missing a preset, or %s' % ', '.join(key for key in PRESET_FIELDS if key not in fields)]
+
+    rarity, size, min_y, max_y, density = (presets[fields['preset']] if 'preset' in fields else tuple(fields[key] for key in PRESET_FIELDS))[:5]
+    if rarity <= 0 or size <= 0:
+        errors.append('rarity and size must be positive')
+    if min_y > max_y:
+        errors.append('min_y must not be above max_y')
+    if not 0 <= density <= 100:
+        errors.append('density must be between 0 and 100')
+    return errors
+
+
+def is_type(value: Any, field_type: type) -> bool:
+    if field_type is list:
+        return isinstance(value, list) and all(isinstance(v, str) for v in value)
+    if field_type is float:
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if field_type is int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, field_type)
+
+
+def vein_tuple(fields: Dict[str, Any], presets: Dict[str, tuple]) -> tuple:
+    """ The fields of a Vein, as preset_vein() would build it """
+    numbers = presets[fields['preset']] if 'preset' in fields else tuple(fields[key] for key in PRESET_FIELDS)
+    return (fields['ore'], fields['type'], *numbers, list(fields['rocks']), *(fields.get(key, default) for key, default in OPTIONAL_FIELDS.items()), fields.get('preset'))
+
+
+def assemble(include_builtin: bool, rocks: Dict[str, Tuple[str, str]], indicators: Dict[str, str], families: Dict[str, List[Tuple[str, tuple]]], presets: Dict[str, tuple]) -> VeinData:
+    from vein_table import VEIN_FAMILIES
+
+    builtin = dict(VEIN_FAMILIES) if include_builtin else {}
+    return VeinData(
+        {name: Rock(*rock) for name, rock in rocks.items()},
+        tuple((family, {**builtin.get(family, {}), **{name: Vein(*fields) for name, fields in families[family]}}) for family, _ in VEIN_FAMILIES),
+        indicators,
+        presets
+    )
+
+
+# Compiled Cache
+# Same as the translation cache in i18n.py, but keyed by the hash of the file, as definition files are often generated, or checked out, with new modification times
+
+def cache_path(path: str) -> str:
+    return os.path.join(os.path.dirname(path), '.cache', os.path.basename(path) + '.bin')
+
+
+def read_cache(path: str, digest: str) -> Optional[tuple]:
+    try:
+        with open(cache_path(path), 'rb') as f:
+            version, python, cached_digest, compiled = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version == CACHE_VERSION and python == tuple(sys.version_info[:2]) and cached_digest == digest:
+        return compiled
+    return None
+
+
+def write_cache(path: str, digest: str, compiled: tuple):
+    from i18n import write_atomic
+    try:
+        os.makedirs(os.path.dirname(cache_path(path)), exist_ok=True)
+        write_atomic(cache_path(path), marshal.dumps((CACHE_VERSION, tuple(sys.version_info[:2]), digest, compiled)))
+    except OSError:
+        pass  # The cache is optional
@@ -0,0 +1,159 @@
+# A compiled, indexed view of the vein definitions in constants.py, or a vein definition file (see vein_data.py), shared by all generators
+
+import sys
+from functools import lru_cache
+from typing import Callable, Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+
+from mcresources.type_definitions import JsonObject
+
+from constants import *
+
+VEIN_FAMILIES: Tuple[Tuple[str, Dict[str, Vein]], ...] = (
+    ('mineral', MINERAL_VEINS),
+    ('deep_mineral', DEEP_MINERAL_VEINS),
+    ('high_ore', HIGH_ORE_VEINS),
+    ('deep_ore', DEEP_ORE_VEINS),
+    ('surprise', SURPRISE_VEINS),
+)
+
+
+class CompiledVein(NamedTuple):
+    name: str
+    family: str
+    vein: Vein
+    rocks: Tuple[str, ...]  # Expanded rocks, in the same order as expand_rocks()
+    blocks: Tuple[JsonObject, ...]  # One {'replace', 'with'} entry per rock
+
+
+class VeinTable:
+    """
+    Every vein, with rock specifications expanded through a category -> rocks index, and ore block lists built once.
+    Block ids are interned, and identical weighted block lists are shared between veins, keyed on the fields that produce them.
+    """
+
+    def __init__(self, rocks: Dict[str, Rock], families: Sequence[Tuple[str, Dict[str, Vein]]], indicators: Dict[str, str] = MINERAL_INDICATORS, base: Optional['VeinTable'] = None):
+        """ If a base table over the same rocks is given, its compiled veins are reused for every vein which is unchanged """
+        from manifest import inputs_hash
+        self.rocks = rocks
+        self.indicators = indicators
+        self.rocks_hash = inputs_hash(rocks)  # Part of the inputs of every vein, see world_gen.vein_inputs()
+        self.category_index: Dict[str, Tuple[str, ...]] = {c: tuple(r for r, d in rocks.items() if d.category == c) for c in ROCK_CATEGORIES}
+        self.ore_blocks_cache: Dict[tuple, Sequence[JsonObject]] = {} if base is None else base.ore_blocks_cache
+        self.families: Dict[str, Tuple[CompiledVein, ...]] = {}
+
+        compiled = {} if base is None else {(v.family, v.name): v for v in base.veins}
+        for family, veins in families:
+            builder = ORE_BLOCK_BUILDERS[family]
+            self.families[family] = tuple(self.reuse(compiled.get((family, name)), v) or self.compile(name, family, v, builder) for name, v in veins.items())
+
+        self.veins: Tuple[CompiledVein, ...] = tuple(v for family in self.families.values() for v in family)
+
+    def family(self, family: str) -> Tuple[CompiledVein, ...]:
+        return self.families[family]
+
+    def expand_rocks(self, rocks_list: Sequence[str], path: Optional[str] = None) -> Tuple[str, ...]:
+        rocks = []
+        for rock_spec in rocks_list:
+            if rock_spec in self.rocks:
+                rocks.append(rock_spec)
+            elif rock_spec in self.category_index:
+                rocks += self.category_index[rock_spec]
+            else:
+                raise RuntimeError('Unknown rock or rock category specification: %s at %s' % (rock_spec, path if path is not None else '??'))
+        return tuple(rocks)
+
+    def reuse(self, compiled: Optional[CompiledVein], vein: Vein) -> Optional[CompiledVein]:
+        return compiled if compiled is not None and compiled.vein == vein else None
+
+    def compile(self, name: str, family: str, vein: Vein, builder: Callable[[Vein, str, bool], List[JsonObject]]) -> CompiledVein:
+        from fragments import fragment
+        rocks = self.expand_rocks(vein.rocks, name)
+        spoiler_rocks: FrozenSet[str] = frozenset(vein.spoiler_rocks or ())
+        return CompiledVein(name, family, vein, rocks, tuple(fragment({
+            'replace': replace_blocks(rock),
+            'with': self.ore_blocks(builder, vein, rock, vein.spoiler_ore is not None and rock in spoiler_rocks)
+        }) for rock in rocks))
+
+    def ore_blocks(self, builder: Callable[[Vein, str, bool], List[JsonObject]], vein: Vein, rock: str, spoiled: bool) -> Sequence[JsonObject]:
+        key = (builder, vein.ore, vein.poor, vein.normal, vein.rich, vein.spoiler_ore if spoiled else None, vein.spoiler_rarity if spoiled else 0, vein.deposits, rock)
+        if key not in self.ore_blocks_cache:
+            from fragments import fragment
+            self.ore_blocks_cache[key] = fragment(builder(vein, rock, spoiled))
+        return self.ore_blocks_cache[key]
+
+
+VEINS_FILE: Optional[str] = None  # A vein definition file, set by --veins
+
+
+def table() -> VeinTable:
+    """ The table for the veins in constants.py, or in VEINS_FILE if set, compiled on first use """
+    return load_table(VEINS_FILE)
+
+
+@lru_cache(maxsize=None)
+def load_table(path: Optional[str]) -> VeinTable:
+    if path is None:
+        return VeinTable(ROCKS, VEIN_FAMILIES)
+    import vein_data
+    data = vein_data.load(path)
+    return VeinTable(data.rocks, data.families, data.indicators)
+
+
+def presets() -> Dict[str, Tuple[int, int, int, int, int, int, int, int]]:
+    """ The presets by name, of constants.py, or of VEINS_FILE if set, which the veins of table() refer to in Vein.preset """
+    if VEINS_FILE is None:
+        return PRESETS
+    import vein_data
+    return vein_data.load(VEINS_FILE).presets
+
+
+def block_id(pattern: str, *args: str) -> str:
+    return sys.intern(pattern % args)
+
+
+@lru_cache(maxsize=None)
+def replace_blocks(rock: str) -> Tuple[str, ...]:
+    from fragments import fragment
+    return fragment([block_id('tfc:rock/raw/%s', rock)])
+
+
+@lru_cache(maxsize=None)
+def spoiler_weight(spoiler_rarity: int) -> int:
+    p = spoiler_rarity * 0.01  # as a percentage of the overall vein
+    return int(100 * p / (1 - p))
+
+
+def mineral_ore_blocks(vein: Vein, rock: str, spoiled: bool) -> List[JsonObject]:
+    if spoiled:
+        return [
+            {'weight': 100, 'block': block_id('tfc:ore/%s/%s', vein.ore, rock)},
+            {'weight': spoiler_weight(vein.spoiler_rarity), 'block': block_id('tfc:ore/%s/%s', vein.spoiler_ore, rock)}
+        ]
+    return [{'block': block_id('tfc:ore/%s/%s', vein.ore, rock)}]
+
+
+def vein_ore_blocks(vein: Vein, rock: str, spoiled: bool) -> List[JsonObject]:
+    ore_blocks = [
+        {'weight': vein.poor, 'block': block_id('tfc:ore/poor_%s/%s', vein.ore, rock)},
+        {'weight': vein.normal, 'block': block_id('tfc:ore/normal_%s/%s', vein.ore, rock)},
+        {'weight': vein.rich, 'block': block_id('tfc:ore/rich_%s/%s', vein.ore, rock)}
+    ]
+    if spoiled:
+        ore_blocks.append({'weight': spoiler_weight(vein.spoiler_rarity), 'block': block_id('tfc:ore/%s/%s', vein.spoiler_ore, rock)})
+    elif vein.deposits:
+        ore_blocks.append({'weight': 10, 'block': block_id('tfc:deposit/%s/%s', vein.ore, rock)})
+    return ore_blocks
+
+
+def surprise_ore_blocks(vein: Vein, rock: str, spoiled: bool) -> List[JsonObject]:
+    return [{'weight': 90, 'block': block_id('tfc:ore/%s/%s', vein.ore, rock)},
+            {'weight': 10, 'block': 'minecraft:lava'}]  # surprise! How difficult would infested TFC stone be?
+
+
+ORE_BLOCK_BUILDERS: Dict[str, Callable[[Vein, str, bool], List[JsonObject]]] = {
+    'mineral': mineral_ore_blocks,
+    'deep_mineral': mineral_ore_blocks,
+    'high_ore': vein_ore_blocks,
+    'deep_ore': vein_ore_blocks,
+    'surprise': surprise_ore_blocks,
+}
@@ -0,0 +1,111 @@
+# Watches the generator sources, and regenerates only what changed, keeping the interpreter and all modules warm
+
+import importlib
+import os
+import time
+import traceback
+from typing import Dict, Optional, Set, Tuple
+
+from fragments import FRAGMENTS
+from manifest import IncrementalResourceManager
+from writer import BufferedResourceManager
+
+# Watched modules, in the order they must be reloaded, with the modules they import from
+MODULES: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ('constants', ()),
+    ('vein_table', ('constants',)),
+    ('world_gen', ('constants', 'vein_table')),
+    ('variants', ('constants', 'vein_table')),
+    ('patchouli', ('constants',)),
+    ('generate_book', ('constants', 'patchouli', 'vein_table')),
+)
+
+# Which generators need to run when a module is reloaded
+GENERATORS: Dict[str, Set[str]] = {
+    'constants': {'worldgen', 'book'},
+    'vein_table': {'worldgen', 'book'},
+    'world_gen': {'worldgen'},
+    'variants': {'worldgen', 'book'},
+    'patchouli': {'book'},
+    'generate_book': {'book'},
+}
+
+
+def main(hotswap: Optional[str], local: Optional[str], interval: float = 0.25):
+    mtimes = snapshot()
+    regenerate({'worldgen', 'book'}, hotswap, local)
+    print('Watching %s for changes, press Ctrl+C to stop' % ', '.join('%s.py' % m for m, _ in MODULES))
+    try:
+        while True:
+            time.sleep(interval)
+            current = snapshot()
+            changed = {m for m, t in current.items() if mtimes.get(m) != t}
+            if not changed:
+                continue
+            mtimes = current
+            try:
+                regenerate(reload(changed), hotswap, local)
+            except Exception:
+                traceback.print_exc()
+    except KeyboardInterrupt:
+        print('Stopped watching')
+
+
+def snapshot() -> Dict[str, int]:
+    return {m: os.stat(module_path(m)).st_mtime_ns for m, _ in MODULES}
+
+
+def module_path(name: str) -> str:
+    return os.path.join(os.path.dirname(__file__), name + '.py')
+
+
+def reload(changed: Set[str]) -> Set[str]:
+    """ Reloads every changed module and every module that imports from one, returning the generators that need to run """
+    reloaded = set()
+    options = [(m, o, getattr(importlib.import_module(m), o)) for m, o in (('vein_table', 'VEINS_FILE'), ('variants', 'VARIANTS_FILE'), ('variants', 'SELECTED'))]  # Set by arguments, and reset by reloading
+    for name, dependencies in MODULES:
+        if name in changed or reloaded.intersection(dependencies):
+            importlib.reload(importlib.import_module(name))
+            reloaded.add(name)
+    for module, option, value in options:
+        setattr(importlib.import_module(module), option, value)
+    print('Reloaded %s' % ', '.join(sorted(reloaded)))
+    return set.union(*(GENERATORS[m] for m in reloaded))
+
+
+def regenerate(generators: Set[str], hotswap: Optional[str], local: Optional[str]):
+    start = time.perf_counter()
+    if 'worldgen' in generators:
+        # Every build interns new fragments, so the last build's are dropped, with the compiled tables which hold them
+        vein_table = importlib.import_module('vein_table')
+        vein_table.load_table.cache_clear()
+        vein_table.replace_blocks.cache_clear()
+        FRAGMENTS.clear()
+        constants = importlib.import_module('constants')
+        world_gen = importlib.import_module('world_gen')
+        variants = importlib.import_module('variants')
+        selected = variants.variants()
+        models = variants.build_models(selected)
+        targets = [(v.resource_dir, v) for v in selected] + ([(hotswap, selected[0])] if hotswap else [])
+        for resource_dir, variant in targets:
+            rm = IncrementalResourceManager('tfc', resource_dir)
+            rm.lang(constants.DEFAULT_LANG)
+            world_gen.generate(rm, variant.hints, models[variant.name])
+            rm.flush()
+            rm.finish()
+            print('worldgen %s: Modified = %d, New = %d, Deleted = %d' % (resource_dir, rm.modified_files, rm.new_files, rm.deleted_files))
+
+    if 'book' in generators:
+        generate_book = importlib.import_module('generate_book')
+        if local:
+            generate_book.LocalInstance.INSTANCE_DIR = local  # Reset by reloading
+        for target, compiled in generate_book.compile_books():
+            rm = BufferedResourceManager(target.domain, target.resource_dir)
+            generate_book.Book(rm, compiled.root_name, {}, generate_book.I18n('en_us'), False, reverse_translate=False).build(compiled)
+            rm.flush()
+            print('book %s: Modified = %d, New = %d' % (target.resource_dir, rm.modified_files, rm.new_files))
+        rm = generate_book.copy_to_local_instance()
+        if rm is not None:
+            print('book %s: Modified = %d, New = %d' % (generate_book.LocalInstance.INSTANCE_DIR, rm.modified_files, rm.new_files))
+
+    print('Regenerated %s in %.0f ms' % (' and '.join(sorted(generators)), 1000 * (time.perf_counter() - start)))
@@ -1,177 +1,208 @@
 # Handles generation of all world gen objects
 
-from typing import Union, get_args
+from functools import lru_cache
+from typing import Iterator, Union, NamedTuple, get_args
 
 from mcresources import ResourceManager, utils
 from mcresources.type_definitions import ResourceIdentifier, JsonObject, Json, VerticalAnchor
 
 from constants import *
+from vein_table import CompiledVein, VeinTable, block_id
+import vein_table
 
 
-def generate(rm: ResourceManager, HINT_GEN=True):
+class VeinFeature(NamedTuple):
+    name: str
+    feature: str
+    config: JsonObject
+    hint: bool  # If the 'indicator' in config is a hint rock, which is omitted when generating without hints
+    inputs: str  # Hash of everything that produced this config, see vein_inputs()
+
+
+class VeinModel(NamedTuple):
+    tag_values: Tuple[str, ...]
+    features: Tuple[VeinFeature, ...]
+    fragments: Tuple[JsonObject, ...]  # The shared fragments in the configs, and only those. A model is pickled to each worker, which registers these again
+
+
+def generate(rm: ResourceManager, HINT_GEN=True, model: Optional[VeinModel] = None):
+    from profiling import phase
+    if model is None:
+        with phase('model'):
+            model = build_model()
+    emit(rm, model, HINT_GEN)
+
+
+def emit(rm: ResourceManager, model: VeinModel, HINT_GEN=True):
+    """ Writes a previously built vein model to a resource manager """
+    for _ in emit_features(rm, model, HINT_GEN):
+        pass
+
+
+def records(model: Optional[VeinModel] = None, HINT_GEN=True) -> Iterator['stream.Record']:
+    """ Yields every world gen file of a vein model as (path, json), feature by feature, then the tags """
+    from stream import RecordingResourceManager
+    if model is None:
+        model = build_model()
+    rm = RecordingResourceManager('tfc')
+    for _ in emit_features(rm, model, HINT_GEN):
+        yield from rm.drain()
+    rm.flush()
+    yield from rm.drain()
+
+
+def emit_features(rm: ResourceManager, model: VeinModel, HINT_GEN=True) -> Iterator[str]:
+    """ Writes each vein feature, yielding its name after it is written. Tags are buffered until the resource manager is flushed """
     # Biome Feature Tags
     # Biomes -> in_biome/<step>/<optional biome>
     # in_biome/ -> other tags in the form feature/<name>s
     # feature/ -> individual features
+    from fragments import FRAGMENTS
+    from manifest import inputs, inputs_hash
+
+    FRAGMENTS.register(model.fragments)
 
     # Tags: in_biome/
-    placed_feature_118_hack(rm, 'in_biome/veins', *[
-        *('tfc:vein/%s' % v for v in MINERAL_VEINS.keys()),
-        *('tfc:vein/%s' % v for v in DEEP_MINERAL_VEINS.keys()),
-        *('tfc:vein/%s' % v for v in HIGH_ORE_VEINS.keys()),
-        *('tfc:vein/%s' % v for v in DEEP_ORE_VEINS.keys()),
-        *('tfc:vein/%s' % v for v in SURPRISE_VEINS.keys()),
-    ])
+    placed_feature_118_hack(rm, 'in_biome/veins', *model.tag_values)
+
+    for f in model.features:
+        config = f.config
+        if f.hint and not HINT_GEN:
+            config = {k: v for k, v in config.items() if k != 'indicator'}
+        with inputs(rm, inputs_hash(f.inputs, f.hint and HINT_GEN)):
+            configured_placed_feature(rm, ('vein', f.name), f.feature, config)
+        yield f.name
+
+
+def build_model(table: Optional[VeinTable] = None) -> VeinModel:
+    """ Computes every vein config once, independent of the output target or hint setting """
+    from fragments import FRAGMENTS
+    from profiling import phase
+    if table is None:
+        with phase('table'):
+            table = vein_table.table()
+
+    features: List[VeinFeature] = []
+    tag_values = tuple('tfc:vein/%s' % v.name for v in table.veins)
 
     # Ore Veins
-    for vein_name, vein in MINERAL_VEINS.items():
-        rocks = expand_rocks(vein.rocks, vein_name)
-        vein_config = {
-            'rarity': vein.rarity,
-            'min_y': utils.vertical_anchor(vein.min_y, 'absolute'),
-            'max_y': utils.vertical_anchor(vein.max_y, 'absolute'),
-            'size': vein.size,
-            'density': vein_density(vein.density),
-            'blocks': [{
-                'replace': ['tfc:rock/raw/%s' % rock],
-                'with': mineral_ore_blocks(vein, rock)
-            } for rock in rocks],
-            'random_name': vein_name,
-            'biomes': vein.biomes,
-        }
-        if HINT_GEN:
-            vein_config['indicator'] = {
-                'rarity': 12,
-                'blocks': [{
-                    'block': 'tfc:rock/loose/%s' % MINERAL_INDICATORS.get(vein.ore)
-                }]
+    with phase('mineral'):
+        for v in table.family('mineral'):
+            vein = v.vein
+            vein_config = {
+                'rarity': vein.rarity,
+                'min_y': vertical_anchor(vein.min_y),
+                'max_y': vertical_anchor(vein.max_y),
+                'size': vein.size,
+                'density': vein_density(vein.density),
+                'blocks': list(v.blocks),
+                'random_name': v.name,
+                'biomes': vein.biomes,
             }
-
-        if vein.type == 'pipe':
-            vein_config['min_skew'] = 5
-            vein_config['max_skew'] = 13
-            vein_config['min_slant'] = 0
-            vein_config['max_slant'] = 2
-        if vein.type == 'disc':
-            vein_config['height'] = vein.height
-        configured_placed_feature(rm, ('vein', vein_name), 'tfc:%s_vein' % vein.type, vein_config)
-
-    for vein_name, vein in DEEP_MINERAL_VEINS.items():
-        rocks = expand_rocks(vein.rocks, vein_name)
-        vein_config = {
-            'rarity': vein.rarity,
-            'min_y': utils.vertical_anchor(vein.min_y, 'absolute'),
-            'max_y': utils.vertical_anchor(vein.max_y, 'absolute'),
-            'size': vein.size,
-            'density': vein_density(vein.density),
-            'blocks': [{
-                'replace': ['tfc:rock/raw/%s' % rock],
-                'with': mineral_ore_blocks(vein, rock)
-            } for rock in rocks],
-            'random_name': vein_name,
-            'biomes': vein.biomes,
-        }
-        if vein.type == 'pipe':
-            vein_config['min_skew'] = 5
-            vein_config['max_skew'] = 13
-            vein_config['min_slant'] = 0
-            vein_config['max_slant'] = 2
-        if vein.type == 'disc':
-            vein_config['height'] = vein.height
-        configured_placed_feature(rm, ('vein', vein_name), 'tfc:%s_vein' % vein.type, vein_config)
-
-    for vein_name, vein in HIGH_ORE_VEINS.items():
-        rocks = expand_rocks(vein.rocks, vein_name)
-        configured_placed_feature(rm, ('vein', vein_name), 'tfc:%s_vein' % vein.type, {
-            'rarity': vein.rarity,
-            'min_y': utils.vertical_anchor(vein.min_y, 'absolute'),
-            'max_y': utils.vertical_anchor(vein.max_y, 'absolute'),
-            'size': vein.size,
-            'density': vein_density(vein.density),
-            'blocks': [{
-                'replace': ['tfc:rock/raw/%s' % rock],
-                'with': vein_ore_blocks(vein, rock)
-            } for rock in rocks],  # no indicator for deep veins!
-            'random_name': vein_name,
-            'biomes': vein.biomes,
-            'indicator': {
-                'rarity': 12,
-                'blocks': [{
-                    'block': 'tfc:ore/small_%s' % vein.ore
-                }]
+            vein_config['indicator'] = indicator('tfc:rock/loose/%s', table.indicators.get(vein.ore))  # hint rock
+
+            if vein.type == 'pipe':
+                vein_config['min_skew'] = 5
+                vein_config['max_skew'] = 13
+                vein_config['min_slant'] = 0
+                vein_config['max_slant'] = 2
+            if vein.type == 'disc':
+                vein_config['height'] = vein.height
+            features.append(VeinFeature(v.name, 'tfc:%s_vein' % vein.type, vein_config, True, vein_inputs(table, v)))
+
+    with phase('deep_mineral'):
+        for v in table.family('deep_mineral'):
+            vein = v.vein
+            vein_config = {
+                'rarity': vein.rarity,
+                'min_y': vertical_anchor(vein.min_y),
+                'max_y': vertical_anchor(vein.max_y),
+                'size': vein.size,
+                'density': vein_density(vein.density),
+                'blocks': list(v.blocks),
+                'random_name': v.name,
+                'biomes': vein.biomes,
             }
-        })
-
-    for vein_name, vein in DEEP_ORE_VEINS.items():
-        rocks = expand_rocks(vein.rocks, vein_name)
-        configured_placed_feature(rm, ('vein', vein_name), 'tfc:%s_vein' % vein.type, {
-            'rarity': vein.rarity,
-            'min_y': utils.vertical_anchor(vein.min_y, 'absolute'),
-            'max_y': utils.vertical_anchor(vein.max_y, 'absolute'),
-            'size': vein.size,
-            'density': vein_density(vein.density),
-            'blocks': [{
-                'replace': ['tfc:rock/raw/%s' % rock],
-                'with': vein_ore_blocks(vein, rock)
-            } for rock in rocks],  # no indicator for deep veins!
-            'random_name': vein_name,
-            'biomes': vein.biomes
-        })
-
-    for vein_name, vein in SURPRISE_VEINS.items():
-        rocks = expand_rocks(vein.rocks, vein_name)
-        configured_placed_feature(rm, ('vein', vein_name), 'tfc:%s_vein' % vein.type, {
-            'rarity': vein.rarity,
-            'min_y': utils.vertical_anchor(vein.min_y, 'absolute'),
-            'max_y': utils.vertical_anchor(vein.max_y, 'absolute'),
-            'size': vein.size,
-            'density': vein_density(vein.density),
-            'blocks': [{
-                'replace': ['tfc:rock/raw/%s' % rock],
-                'with': [{'weight': 90, 'block': 'tfc:ore/%s/%s' % (vein.ore, rock)},
-                         {'weight': 10, 'block': 'minecraft:lava'}] #surprise! How difficult would infested TFC stone be?
-            } for rock in rocks], #nod to CustomOreGen gem pipes
-            'random_name': vein_name,
-            'biomes': vein.biomes
-        })
+            if vein.type == 'pipe':
+                vein_config['min_skew'] = 5
+                vein_config['max_skew'] = 13
+                vein_config['min_slant'] = 0
+                vein_config['max_slant'] = 2
+            if vein.type == 'disc':
+                vein_config['height'] = vein.height
+            features.append(VeinFeature(v.name, 'tfc:%s_vein' % vein.type, vein_config, False, vein_inputs(table, v)))
+
+    with phase('high_ore'):
+        for v in table.family('high_ore'):
+            vein = v.vein
+            features.append(VeinFeature(v.name, 'tfc:%s_vein' % vein.type, {
+                'rarity': vein.rarity,
+                'min_y': vertical_anchor(vein.min_y),
+                'max_y': vertical_anchor(vein.max_y),
+                'size': vein.size,
+                'density': vein_density(vein.density),
+                'blocks': list(v.blocks),
+                'random_name': v.name,
+                'biomes': vein.biomes,
+                'indicator': indicator('tfc:ore/small_%s', vein.ore)
+            }, False, vein_inputs(table, v)))
+
+    with phase('deep_ore'):
+        for v in table.family('deep_ore'):
+            vein = v.vein
+            features.append(VeinFeature(v.name, 'tfc:%s_vein' % vein.type, {
+                'rarity': vein.rarity,
+                'min_y': vertical_anchor(vein.min_y),
+                'max_y': vertical_anchor(vein.max_y),
+                'size': vein.size,
+                'density': vein_density(vein.density),
+                'blocks': list(v.blocks),  # no indicator for deep veins!
+                'random_name': v.name,
+                'biomes': vein.biomes
+            }, False, vein_inputs(table, v)))
+
+    with phase('surprise'):
+        for v in table.family('surprise'):
+            vein = v.vein
+            features.append(VeinFeature(v.name, 'tfc:%s_vein' % vein.type, {
+                'rarity': vein.rarity,
+                'min_y': vertical_anchor(vein.min_y),
+                'max_y': vertical_anchor(vein.max_y),
+                'size': vein.size,
+                'density': vein_density(vein.density),
+                'blocks': list(v.blocks),  # nod to CustomOreGen gem pipes
+                'random_name': v.name,
+                'biomes': vein.biomes
+            }, False, vein_inputs(table, v)))
+
+    return VeinModel(tag_values, tuple(features), FRAGMENTS.used(f.config for f in features))
 
 
 # Vein Helper Functions
+def vein_inputs(table: VeinTable, v: CompiledVein) -> str:
+    """ The family decides the builder of the ore blocks, and if the vein has an indicator, so it is an input along with the vein itself """
+    from manifest import inputs_hash
+    return inputs_hash(source_hash(), table.rocks_hash, v.family, v.name, v.vein, table.indicators.get(v.vein.ore))
+
+
+@lru_cache(maxsize=None)
+def source_hash() -> str:
+    """ Any change to the generator invalidates every vein """
+    from manifest import inputs_hash
+    with open(__file__, 'rb') as f, open(vein_table.__file__, 'rb') as t:
+        return inputs_hash(f.read(), t.read())
+
+
+def is_spoiled(vein: Vein, rock: str) -> bool:
+    return vein.spoiler_ore is not None and rock in vein.spoiler_rocks
+
+
 def mineral_ore_blocks(vein: Vein, rock: str) -> List[Dict[str, Any]]:
-    if vein.spoiler_ore is not None and rock in vein.spoiler_rocks:
-        ore_blocks = [{'weight': 100, 'block': 'tfc:ore/%s/%s' % (vein.ore, rock)}]
-        p = vein.spoiler_rarity * 0.01  # as a percentage of the overall vein
-        ore_blocks.append({
-            'weight': int(100 * p / (1 - p)),
-            'block': 'tfc:ore/%s/%s' % (vein.spoiler_ore, rock)
-        })
-    else:
-        ore_blocks = [{'block': 'tfc:ore/%s/%s' % (vein.ore, rock)}]
-    return ore_blocks
+    return vein_table.mineral_ore_blocks(vein, rock, is_spoiled(vein, rock))
+
 
 def vein_ore_blocks(vein: Vein, rock: str) -> List[Dict[str, Any]]:
-    ore_blocks = [{
-        'weight': vein.poor,
-        'block': 'tfc:ore/poor_%s/%s' % (vein.ore, rock)
-    }, {
-        'weight': vein.normal,
-        'block': 'tfc:ore/normal_%s/%s' % (vein.ore, rock)
-    }, {
-        'weight': vein.rich,
-        'block': 'tfc:ore/rich_%s/%s' % (vein.ore, rock)
-    }]
-    if vein.spoiler_ore is not None and rock in vein.spoiler_rocks:
-        p = vein.spoiler_rarity * 0.01  # as a percentage of the overall vein
-        ore_blocks.append({
-            'weight': int(100 * p / (1 - p)),
-            'block': 'tfc:ore/%s/%s' % (vein.spoiler_ore, rock)
-        })
-    elif vein.deposits:
-        ore_blocks.append({
-            'weight': 10,
-            'block': 'tfc:deposit/%s/%s' % (vein.ore, rock)
-        })
-    return ore_blocks
+    return vein_table.vein_ore_blocks(vein, rock, is_spoiled(vein, rock))
 
 
 def vein_density(density: int) -> float:
@@ -180,17 +211,18 @@ def vein_density(density: int) -> float:
 
 
 # Value Providers
+# Anchors and indicators are shared fragments, see fragments.py
+
+def vertical_anchor(y: int) -> VerticalAnchor:
+    from fragments import fragment
+    return fragment(utils.vertical_anchor(y, 'absolute'))
+
+def indicator(pattern: str, *args: str) -> JsonObject:
+    from fragments import fragment
+    return fragment({'rarity': 12, 'blocks': [{'block': block_id(pattern, *args)}]})
 
 def expand_rocks(rocks_list: List[str], path: Optional[str] = None) -> List[str]:
-    rocks = []
-    for rock_spec in rocks_list:
-        if rock_spec in ROCKS:
-            rocks.append(rock_spec)
-        elif rock_spec in ROCK_CATEGORIES:
-            rocks += [r for r, d in ROCKS.items() if d.category == rock_spec]
-        else:
-            raise RuntimeError('Unknown rock or rock category specification: %s at %s' % (rock_spec, path if path is not None else '??'))
-    return rocks
+    return list(vein_table.table().expand_rocks(rocks_list, path))
 
 def placed_feature_118_hack(rm, name_parts: ResourceIdentifier, *values: ResourceIdentifier):
     placed_feature_tag(rm, name_parts, *values)
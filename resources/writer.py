@@ -0,0 +1,120 @@
+# Concurrent writing of generated files, for file systems where the latency of each open, write and close dominates generation time
+# Files are serialized on the caller thread, and compared, created and written on a bounded pool of threads, while generation continues.
+
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from mcresources import ResourceManager, utils
+from mcresources.type_definitions import Json
+
+import fragments
+
+WORKERS = 8
+
+
+class Writer:
+    """
+    Queues writes of serialized files, and performs them on a pool of threads.
+    A write to a path which is still queued replaces the queued content, so each path is written at most once per flush, and never by two threads at once.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or WORKERS
+        self.pool: Optional[ThreadPoolExecutor] = None
+        self.lock = threading.Lock()
+        self.pending: Dict[str, Tuple[str, Json]] = {}  # path -> (text, data), queued and not yet started
+        self.running: Set[str] = set()  # paths with a task, which writes pending content until there is none
+        self.futures: List[Future] = []
+        self.coalesced = 0
+
+    def write(self, path: str, text: str, data: Json):
+        """ Queues a file to be written, unless it is identical to the file on disk. Data must not be modified afterwards """
+        with self.lock:
+            if path in self.pending:
+                self.coalesced += 1
+            self.pending[path] = text, data
+            if path in self.running:
+                return
+            self.running.add(path)
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix='writer')
+        self.futures.append(self.pool.submit(self.run, path))
+
+    def run(self, path: str) -> List[Tuple[str, utils.WriteFlag, Optional[Exception]]]:
+        results = []
+        while True:
+            with self.lock:
+                if path not in self.pending:
+                    self.running.discard(path)
+                    return results
+                text, data = self.pending.pop(path)
+            results.append(write_file(path, text, data))
+
+    def wait(self) -> List[Tuple[str, utils.WriteFlag, Optional[Exception]]]:
+        """ Waits for every queued write, returning (path, flag, error) for each file written """
+        results = []
+        futures, self.futures = self.futures, []
+        for future in futures:
+            results += future.result()
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        return results
+
+
+def write_file(path: str, text: str, data: Json) -> Tuple[str, utils.WriteFlag, Optional[Exception]]:
+    """ Writes a file like utils.write(), leaving it untouched if the content is unchanged """
+    try:
+        exists = os.path.isfile(path)
+        if exists:
+            with open(path, 'r', encoding='utf-8') as f:
+                old_text = f.read()
+            if old_text == text or json.loads(old_text) == data:
+                return path, utils.WriteFlag.UNCHANGED, None
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path, utils.WriteFlag.MODIFIED if exists else utils.WriteFlag.NEW, None
+    except Exception as e:
+        return path, utils.WriteFlag.ERROR, e
+
+
+class BufferedResourceManager(ResourceManager):
+    """
+    A resource manager which writes files concurrently. flush() waits for every write, and raises a single error listing every file which failed.
+    Statistics are only updated by flush().
+    """
+
+    def __init__(self, domain: str, resource_dir: str, workers: Optional[int] = None):
+        super().__init__(domain, resource_dir)
+        self.writer = Writer(workers)
+
+    def write(self, path_parts: Sequence[str], data: Json):
+        path = os.path.normpath(os.path.join(self.resource_dir, *path_parts)) + '.json'
+        data = fragments.del_none({'__comment__': 'This file was automatically created by mcresources', **data})
+        self.write_json(path, data)
+        self.written_files.add(path)
+
+    def write_json(self, path: str, data: Json):
+        self.writer.write(path, fragments.dumps(data, self.indent, self.ensure_ascii), data)
+
+    def flush(self):
+        super().flush()
+        errors = []
+        for path, flag, error in self.writer.wait():
+            if flag == utils.WriteFlag.NEW:
+                self.new_files += 1
+            elif flag == utils.WriteFlag.MODIFIED:
+                self.modified_files += 1
+            elif flag == utils.WriteFlag.UNCHANGED:
+                self.unchanged_files += 1
+            else:
+                self.on_error(path, error)
+                self.error_files += 1
+                errors.append('%s: %s' % (path, error))
+        if errors:
+            raise RuntimeError('Failed to write %d files:\n%s' % (len(errors), '\n'.join(errors)))